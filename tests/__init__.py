@@ -0,0 +1 @@
+"""Wyvern Tests."""
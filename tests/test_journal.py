@@ -0,0 +1,138 @@
+"""Tests of resuming runs from a :class:`~wyvern.minimal.journal.Journal`."""
+
+from pathlib import Path
+from queue import Queue
+
+import pytest
+
+from wyvern.abstract import Job, Manager
+from wyvern.data_store import YamlDataStore
+from wyvern.minimal.journal import Journal
+from wyvern.minimal.manager import MinimalManager
+
+ran: list[int] = []
+"""The numbers of the jobs run, in the order they ran."""
+
+
+class NumberJob(Job):
+    """Job recording its number when it runs."""
+
+    def __init__(self: "NumberJob", number: int) -> None:
+        """Create Object."""
+        self.name = f"job {number}"
+        self.number = number
+        self.sub_jobs = Queue()
+
+    def do_download(self: "NumberJob", _: Manager) -> None:
+        """Record the job running."""
+        ran.append(self.number)
+
+    def should_skip(self: "NumberJob", _: Manager) -> bool:
+        """Never skip the job."""
+        return False
+
+    def serialize(self: "NumberJob") -> dict:
+        """Store the number."""
+        return {"number": self.number}
+
+    @classmethod
+    def deserialize(cls: type["NumberJob"], data: dict) -> "NumberJob":
+        """Recreate the job."""
+        return cls(data["number"])
+
+
+@pytest.fixture(autouse=True)
+def _in_tmp_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Run each test in an empty directory, with no jobs run yet."""
+    monkeypatch.chdir(tmp_path)
+    ran.clear()
+
+
+def run(journal: Path, numbers: range) -> MinimalManager:
+    """Run a manager with a journal, loading jobs for ``numbers`` if needed."""
+    manager = MinimalManager("test", YamlDataStore, 1, Journal(journal))
+    manager.resume()
+    if manager.needs_loading():
+        manager.produce(
+            lambda manager: [manager.add_job(NumberJob(n)) for n in numbers],
+        )
+    manager.do_jobs()
+    return manager
+
+
+def test_finished_run_loads_again() -> None:
+    """A run after one which finished loads and runs every job again."""
+    run(Path("journal.jsonl"), range(3))
+    assert sorted(ran) == [0, 1, 2]
+
+    ran.clear()
+    run(Path("journal.jsonl"), range(3))
+    assert sorted(ran) == [0, 1, 2]
+
+
+def test_loaded_run_resumes() -> None:
+    """A run which loaded every job resumes the jobs left, without loading."""
+    journal = Journal(Path("journal.jsonl"))
+    journal.start([])
+    for number in range(3):
+        journal.queued(number, 0, NumberJob(number))
+    journal.all_loaded()
+    journal.completed(1)
+    journal.close()
+
+    manager = run(Path("journal.jsonl"), range(5))
+    assert not manager.needs_loading()
+    assert sorted(ran) == [0, 2]
+
+
+def test_unloaded_run_skips_completed() -> None:
+    """A run which had not loaded every job loads them, skipping done ones."""
+    journal = Journal(Path("journal.jsonl"))
+    journal.start([])
+    for number in range(3):
+        journal.queued(number, 0, NumberJob(number))
+    journal.completed(1)
+    journal.close()
+
+    manager = run(Path("journal.jsonl"), range(5))
+    assert manager.needs_loading()
+    assert sorted(ran) == [0, 2, 3, 4]
+
+
+class ParentJob(NumberJob):
+    """Job putting a sub job for each of its ``children``."""
+
+    def __init__(self: "ParentJob", number: int, children: list[int]) -> None:
+        """Create Object."""
+        super().__init__(number)
+        self.children = children
+
+    def do_download(self: "ParentJob", manager: Manager) -> None:
+        """Record the job running, and put its sub jobs."""
+        super().do_download(manager)
+        for child in self.children:
+            self.sub_jobs.put(NumberJob(child))
+
+    def serialize(self: "ParentJob") -> dict:
+        """Store the number and children."""
+        return {"number": self.number, "children": self.children}
+
+    @classmethod
+    def deserialize(cls: type["ParentJob"], data: dict) -> "ParentJob":
+        """Recreate the job."""
+        return cls(data["number"], data["children"])
+
+
+def test_restarted_parent_skips_restored_sub_jobs() -> None:
+    """A parent run again does not put the sub jobs restored with it."""
+    journal = Journal(Path("journal.jsonl"))
+    journal.start([])
+    journal.queued(0, 0, ParentJob(0, [1, 2]))
+    journal.all_loaded()
+    journal.started(0)
+    journal.queued(1, -1, NumberJob(1))
+    journal.queued(2, -1, NumberJob(2))
+    journal.close()
+
+    run(Path("journal.jsonl"), range(0))
+    assert sorted(ran) == [0, 1, 2]
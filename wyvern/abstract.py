@@ -6,11 +6,22 @@ Contains the abstract classes used by the project.
 * :class:`~Artisan`
 * :class:`~Factory`
 * :class:`~Job`
+* :class:`~Library`
 * :class:`~Manager`
 """
+import asyncio
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from pathlib import Path
 from queue import Queue
-from threading import Event
+from typing import TYPE_CHECKING, TypeVar
+
+from requests import Session
+
+if TYPE_CHECKING:
+    from wyvern.network.bandwidth import Bandwidth
+
+T = TypeVar("T")
 
 
 class DataStore(ABC):
@@ -24,10 +35,13 @@ class DataStore(ABC):
 
     * :func:`__getitem__` Get the stored value.
     * :func:`__setitem__` Set the stored value
+    * :func:`get_many` Get several stored values
+    * :func:`set_many` Set several stored values
 
-    These functions should call to the store directly (without caching). This
-    avoids the case where there are multiple nodes downloading causing a race
-    condition.
+    These functions should call to the store directly (without caching), or
+    check a cached copy is still current on every call (eg by the
+    modification time of a file). This avoids the case where there are
+    multiple nodes downloading causing a race condition.
     """
 
     @abstractmethod
@@ -53,6 +67,31 @@ class DataStore(ABC):
     ) -> None:
         """Store the value."""
 
+    def get_many(
+        self: "DataStore",
+        keys: Iterable[str],
+    ) -> dict[str, str]:
+        """
+        Get several stored values.
+
+        Stores should override this if they can fetch the values in one
+        batch.
+        """
+        return {key: self[key] for key in keys}
+
+    def set_many(
+        self: "DataStore",
+        values: dict[str, str],
+    ) -> None:
+        """
+        Store several values.
+
+        Stores should override this if they can write the values in one
+        batch.
+        """
+        for key, value in values.items():
+            self[key] = value
+
 
 class Job(ABC):
     """Job Base Class.
@@ -72,9 +111,6 @@ class Job(ABC):
     failed, the exception it raised.
     """
 
-    updated: Event = Event()
-    """Event to be called when the externally visible members are updated."""
-
     sub_jobs: Queue["Job"] | None
     """
     Sub Jobs Created as part of the job processing.
@@ -84,8 +120,60 @@ class Job(ABC):
     themed non-terminations.
     """
 
-    progress: float = 0.0
-    """The progress through the download. Valid values are between 0 and 1"""
+    resource: str = "network"
+    """
+    What the job spends most of its time using.
+
+    One of ``network`` (the default), ``disk``, ``cpu`` or ``subprocess``
+    (eg running FFmpeg). Managers may run each kind in a pool of its own, so
+    a few slow jobs of one kind do not hold up the others.
+    """
+
+    done: int = 0
+    """
+    Work completed so far (normally bytes downloaded).
+
+    Jobs should assign this (and :attr:`total`) directly as they progress. The
+    manager samples it (and :attr:`status`) at a fixed rate rather than being
+    notified, so it is cheap enough to update on every chunk of a download.
+    Only the job should write to it.
+    """
+
+    total: int = 0
+    """The total work in the job (normally bytes), or 0 if it is unknown."""
+
+    size_hint: int | None = None
+    """
+    The expected size of the download (in bytes), if known before it starts.
+
+    Used by scheduling policies (eg smallest first). Jobs should only set it
+    when it is cheap to find out, such as from a listing of files.
+    """
+
+    group_hint: str | None = None
+    """
+    The group the job belongs to (eg the publisher), if any.
+
+    Used by scheduling policies which take turns between groups.
+    """
+
+    _progress: float = 0.0
+
+    @property
+    def progress(self: "Job") -> float:
+        """
+        The progress through the download. Valid values are between 0 and 1.
+
+        This is :attr:`done` / :attr:`total` if the total is known, otherwise
+        the value last assigned.
+        """
+        if self.total:
+            return min(self.done / self.total, 1.0)
+        return self._progress
+
+    @progress.setter
+    def progress(self: "Job", value: float) -> None:
+        self._progress = value
 
     @abstractmethod
     def do_download(self: "Job", manager: "Manager") -> None:
@@ -93,8 +181,23 @@ class Job(ABC):
         Run the download.
 
         This function will execute the download of the job, updating
-        :attr:`status` and :attr:`progress` as appropriate.
+        :attr:`status` and :attr:`done` (or :attr:`progress`) as appropriate.
+        """
+
+    async def do_download_async(self: "Job", manager: "Manager") -> None:
+        """
+        Run the download on an asyncio event loop.
+
+        Jobs which spend most of their time waiting on the network (eg
+        metadata requests) can override this, so an asyncio manager can run
+        many of them at once without a thread for each. It must not block the
+        event loop.
+
+        By default, this runs :meth:`do_download` in the event loop's default
+        executor.
         """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.do_download, manager)
 
     @abstractmethod
     def should_skip(self: "Job", manager: "Manager") -> bool:
@@ -104,6 +207,29 @@ class Job(ABC):
         This should check if the file already exists in the destination folder.
         """
 
+    def serialize(self: "Job") -> dict | None:
+        """
+        Get a compact form of the job, to restore it in a later run.
+
+        This should only contain what :meth:`deserialize` needs to recreate
+        the job, and must be JSON serializable. Return None (the default) if
+        the job cannot be restored.
+        """
+        return None
+
+    @classmethod
+    def deserialize(
+        cls: type["Job"],
+        data: dict,  # noqa: ARG003
+    ) -> "Job | None":
+        """
+        Recreate a job from the output of :meth:`serialize`.
+
+        Jobs overriding :meth:`serialize` must override this too. Return None
+        (the default) if the job cannot be recreated.
+        """
+        return None
+
 
 class Manager(ABC):
     """Manager Class.
@@ -136,12 +262,54 @@ class Manager(ABC):
     plugin_id: str
     """The calling Artisan or Factory's :attr:`~Factory.plugin_id`"""
 
+    bandwidth: "Bandwidth"
+    """Limit on the bytes per second downloaded by the jobs.
+
+    Downloads should draw on it with
+    :meth:`~wyvern.network.bandwidth.Bandwidth.throttle` as they receive
+    data (which :class:`~wyvern.network.Download` does when given it).
+    """
+
+    session: Session
+    """HTTP session shared by every job.
+
+    Plugins should make their requests through this session rather than
+    :mod:`requests` directly, so connections are pooled and kept alive between
+    requests. It is safe to use from multiple threads.
+
+    Managers may cache the responses to ``GET`` requests, revalidating them
+    with conditional requests (see :class:`~wyvern.network.cache.HttpCache`).
+    Responses answered from the cache have ``from_cache`` set to True.
+    """
+
+    def run_cpu(
+        self: "Manager",
+        fn: Callable[..., T],
+        *args: object,
+    ) -> T:
+        """
+        Run CPU-heavy work (eg parsing) without holding up other jobs.
+
+        Managers may run ``fn`` in another process, so it and its arguments
+        must be picklable (eg a module-level function). By default, it is
+        called directly.
+
+        :returns: The result of ``fn(*args)``.
+        """
+        return fn(*args)
+
     @abstractmethod
     def add_job(self: "Manager", job: Job | None) -> None:
         """
         Add a job object to the queue.
 
         This will add to the queue of jobs to be executed directly after this.
+
+        Managers may block while their queue is full, but only when called
+        from a thread they are loading jobs in (eg running
+        :meth:`Factory.load_jobs`) while other threads run the jobs. Adding a
+        job from any other thread never blocks, so jobs can be added before
+        the manager is started.
         """
 
 
@@ -201,3 +369,45 @@ class Factory(ABC):
         way that a job can be starting to be downloaded while later jobs are
         being added (eg loading in later pages of results).
         """
+
+
+class Library(ABC):
+    """Library Base Class.
+
+    This class lists the files a plugin has already downloaded, with what
+    they should contain, so they can be checked for corruption (eg by
+    :mod:`wyvern.minimal.scrub`) and downloaded again if they are bad.
+    """
+
+    plugin_id: str
+    """
+    ID of the plugin whose files are listed
+
+    The same as the :attr:`~Factory.plugin_id` of the Factory which
+    downloaded them.
+    """
+
+    @abstractmethod
+    def downloaded_files(
+        self: "Library",
+        manager: Manager,
+    ) -> Iterable[tuple[str, Path, int | None, str | None]]:
+        """
+        List the downloaded files.
+
+        :returns: ``(file_id, path, size, md5_hash)`` for each file, where the
+            size and md5 are what the file should have (or None if unknown).
+        """
+
+    @abstractmethod
+    def redownload_jobs(
+        self: "Library",
+        manager: Manager,
+        file_ids: list[str],
+    ) -> Iterable[Job]:
+        """
+        Create jobs to download files again.
+
+        The files should not be skipped by the jobs, even though they have
+        been downloaded before.
+        """
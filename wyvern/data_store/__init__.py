@@ -1,5 +1,11 @@
 """Wyvern Data Store Classes."""
 
-from .yaml import YamlDataStore
+from .sqlite import SqliteDatabase, SqliteDataStore
+from .yaml import CachedYamlDataStore, YamlDataStore
 
-__all__ = ["YamlDataStore"]
+__all__ = [
+    "CachedYamlDataStore",
+    "SqliteDataStore",
+    "SqliteDatabase",
+    "YamlDataStore",
+]
@@ -0,0 +1,199 @@
+"""
+SQLite Data Store.
+
+Used for storing data in a SQLite database shared between processes, and
+the :class:`SqliteDatabase` other SQLite files (eg caches) are kept in.
+"""
+
+import json
+import sqlite3
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock, local
+
+from wyvern.abstract import DataStore
+
+
+class SqliteDataStore(DataStore):
+    """
+    SQLite Data Store.
+
+    Used for storing data in a SQLite database, keyed by ``(plugin_id, key)``.
+    Values are stored as JSON, so they keep their type as in the YAML store.
+
+    The database is opened in WAL mode, so readers are never blocked by a
+    writer, and writes from other threads or processes are serialised by
+    SQLite rather than overwriting each other. Every write is its own
+    transaction unless grouped with :meth:`transaction`. WAL mode needs all
+    the processes using the database to be on the same host as the file.
+
+    As :class:`~wyvern.minimal.manager.MinimalManager` names its stores after
+    YAML files, a ``.yaml`` path is stored in a ``.sqlite3`` file of the same
+    name instead.
+    """
+
+    def __init__(
+        self: "SqliteDataStore",
+        plugin_id: str,
+        config_str: str,
+    ) -> None:
+        """
+        Create a SqliteDataStore.
+
+        :param plugin_id: The plugin for the data store.
+        :param config_str: The Path to the database.
+        """
+        self.plugin_id = plugin_id
+        self.file = Path(config_str)
+        if self.file.suffix in {".yaml", ".yml"}:
+            self.file = self.file.with_suffix(".sqlite3")
+
+        self._local = local()
+        with self.transaction() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS data ("
+                " plugin_id TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " PRIMARY KEY (plugin_id, key)"
+                ") WITHOUT ROWID",
+            )
+
+    def __getitem__(self: "SqliteDataStore", key: str) -> str:
+        """Get the stored value."""
+        return self.get_many([key])[key]
+
+    def __setitem__(self: "SqliteDataStore", key: str, value: str) -> None:
+        """Store the value."""
+        self.set_many({key: value})
+
+    def get_many(
+        self: "SqliteDataStore",
+        keys: Iterable[str],
+    ) -> dict[str, str]:
+        """Get several stored values in one query."""
+        keys = list(keys)
+        values = dict.fromkeys(keys, "")
+        placeholders = ", ".join("?" * len(keys))
+        rows = self._connection.execute(
+            "SELECT key, value FROM data"  # noqa: S608
+            f" WHERE plugin_id = ? AND key IN ({placeholders})",
+            [self.plugin_id, *keys],
+        )
+        for key, value in rows:
+            values[key] = json.loads(value)
+        return values
+
+    def set_many(self: "SqliteDataStore", values: dict[str, str]) -> None:
+        """Store several values in one transaction."""
+        with self.transaction() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO data (plugin_id, key, value)"
+                " VALUES (?, ?, ?)",
+                [
+                    (self.plugin_id, key, json.dumps(value))
+                    for key, value in values.items()
+                ],
+            )
+
+    @contextmanager
+    def transaction(self: "SqliteDataStore") -> Iterator[sqlite3.Connection]:
+        """
+        Group reads and writes into one transaction.
+
+        The write lock is taken at the start, so values read inside the
+        transaction cannot be changed by anyone else before it commits. If an
+        exception is raised, nothing is written. Nested calls join the
+        outermost transaction.
+        """
+        db = self._connection
+        if db.in_transaction:
+            yield db
+            return
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.rollback()
+            raise
+        db.commit()
+
+    @property
+    def _connection(self: "SqliteDataStore") -> sqlite3.Connection:
+        """Get this thread's connection to the database."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.file, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+
+class SqliteDatabase:
+    """
+    SQLite database shared by the threads of a process.
+
+    The database has one connection, in autocommit mode, which is used by
+    one thread at a time. It is opened in WAL mode, so readers are never
+    blocked by a writer in another process.
+
+    :param path: The database file, or None to keep it in memory.
+    :param schema: Statements run when the database is opened (eg
+        ``CREATE TABLE IF NOT EXISTS``).
+    """
+
+    def __init__(
+        self: "SqliteDatabase",
+        path: Path | None,
+        schema: Iterable[str] = (),
+    ) -> None:
+        """Open (or create) the database."""
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._db = sqlite3.connect(
+            ":memory:" if path is None else path,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self.execute("PRAGMA journal_mode=WAL")
+        with self.transaction() as db:
+            for statement in schema:
+                db.execute(statement)
+
+    def execute(
+        self: "SqliteDatabase",
+        query: str,
+        params: Iterable = (),
+    ) -> list[tuple]:
+        """Run a statement in its own transaction, returning every row."""
+        with self._lock:
+            return self._db.execute(query, params).fetchall()
+
+    @contextmanager
+    def transaction(
+        self: "SqliteDatabase",
+        *,
+        immediate: bool = False,
+    ) -> Iterator[sqlite3.Connection]:
+        """
+        Use the connection for one transaction.
+
+        No other thread can use the database until the transaction ends. If
+        an exception is raised, nothing is written.
+
+        :param immediate: Take the write lock at the start, so what is read
+            cannot be changed by another process before it commits.
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield self._db
+            except BaseException:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
@@ -4,40 +4,65 @@ Yaml Data Store.
 Used for storing data in a yaml file.
 """
 
-from contextlib import suppress
+import os
+import shutil
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, suppress
 from pathlib import Path
+from tempfile import NamedTemporaryFile
+from threading import Lock
 
 import yaml
 
 from wyvern.abstract import DataStore
 
+try:
+    import fcntl
+except ImportError:  # Windows has no advisory locks
+    fcntl = None
+
 
 class YamlDataStore(DataStore):
     """
     Yaml Data Store.
 
     Used for storing data in a yaml file.
+
+    Writes hold an advisory lock on ``<file>.lock`` while the file is read,
+    updated and atomically replaced, so concurrent writers (in other threads,
+    processes or nodes sharing the file) do not lose each other's updates.
+    Readers never see a partially written file.
+
+    In caching mode the parsed file is kept in memory, and is only parsed
+    again when the file's modification time, size or inode change.
     """
 
     def __init__(
         self: "YamlDataStore",
         plugin_id: str,
         config_str: str,
+        *,
+        cached: bool = False,
     ) -> None:
         """
         Create a YamlDataStore.
 
         :param plugin_id: The plugin for the data store.
         :param config_str: The Path to the YAML file.
+        :param cached: Keep the parsed file until it changes on disk.
         """
         self.plugin_id = plugin_id
         self.file = Path(config_str)
+        self.lock_file = self.file.with_name(self.file.name + ".lock")
+        self.cached = cached
+
+        self._lock = Lock()
+        self._data: dict = {}
+        self._stamp: tuple | None = None
 
     def __getitem__(self: "YamlDataStore", key: str) -> str:
         """Get the stored value."""
-        data = {}
-        with suppress(FileNotFoundError), self.file.open() as f:
-            data = yaml.safe_load(f)
+        data = self._load()
         if self.plugin_id in data:
             plugin = data[self.plugin_id]
             return plugin.get(key, "")
@@ -45,11 +70,98 @@ class YamlDataStore(DataStore):
 
     def __setitem__(self: "YamlDataStore", key: str, value: str) -> None:
         """Store the value."""
+        self.set_many({key: value})
+
+    def get_many(
+        self: "YamlDataStore",
+        keys: Iterable[str],
+    ) -> dict[str, str]:
+        """Get several stored values, parsing the file once."""
+        plugin = self._load().get(self.plugin_id, {})
+        return {key: plugin.get(key, "") for key in keys}
+
+    def set_many(self: "YamlDataStore", values: dict[str, str]) -> None:
+        """Store several values, writing the file once."""
+        with self._lock, self._locked():
+            data = self._read()
+            if self.plugin_id not in data:
+                data[self.plugin_id] = {}
+            data[self.plugin_id].update(values)
+            self._write(data)
+            self._stamp = None
+
+    def _load(self: "YamlDataStore") -> dict:
+        """Get the parsed file, from the cache if it is unchanged."""
+        if not self.cached:
+            return self._read()
+
+        stamp = self._stat()
+        with self._lock:
+            if self._stamp is None or stamp != self._stamp:
+                self._data = self._read()
+                self._stamp = stamp
+            return self._data
+
+    def _stat(self: "YamlDataStore") -> tuple:
+        """Get what identifies this version of the file."""
+        try:
+            stat = self.file.stat()
+        except FileNotFoundError:
+            return ()
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _read(self: "YamlDataStore") -> dict:
+        """Parse the file."""
         data = {}
         with suppress(FileNotFoundError), self.file.open() as f:
             data = yaml.safe_load(f)
-        if self.plugin_id not in data:
-            data[self.plugin_id] = {}
-        data[self.plugin_id][key] = value
-        with self.file.open("w") as f:
-            yaml.safe_dump(data, f)
+        return data or {}
+
+    def _write(self: "YamlDataStore", data: dict) -> None:
+        """Atomically replace the file."""
+        f = NamedTemporaryFile(  # noqa: SIM115
+            "w",
+            dir=self.file.parent,
+            prefix=f".{self.file.name}.",
+            delete=False,
+        )
+        try:
+            with f:
+                yaml.safe_dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            with suppress(FileNotFoundError):
+                shutil.copymode(self.file, f.name)
+            Path(f.name).replace(self.file)
+        except BaseException:
+            Path(f.name).unlink(missing_ok=True)
+            raise
+
+    @contextmanager
+    def _locked(self: "YamlDataStore") -> Iterator[None]:
+        """Hold the advisory lock for the file."""
+        if fcntl is None:
+            yield
+            return
+        with self.lock_file.open("a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CachedYamlDataStore(YamlDataStore):
+    """
+    Yaml Data Store in caching mode.
+
+    A :class:`YamlDataStore` which only parses the file again when it changes.
+    """
+
+    def __init__(
+        self: "CachedYamlDataStore",
+        plugin_id: str,
+        config_str: str,
+    ) -> None:
+        """Create a YamlDataStore in caching mode."""
+        super().__init__(plugin_id, config_str, cached=True)
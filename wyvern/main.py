@@ -3,22 +3,24 @@
 from argparse import ArgumentParser
 
 from .minimal import main as minimal_main
+from .minimal import scrub
 
 
 def main(name: str | None = None) -> None:
     """
     Run Wyvern Tools.
 
-    usage: python -m wyvern [-h] {minimal} ...
+    usage: python -m wyvern [-h] {minimal,scrub} ...
 
     Run Wyvern Tools
 
     positional arguments:
-      {minimal}   sub-command help
-        minimal   Run The Minimal Downloader
+      {minimal,scrub}  sub-command help
+        minimal        Run The Minimal Downloader
+        scrub          Check the files downloaded by a plugin
 
     options:
-        -h, --help  show this help message and exit
+        -h, --help       show this help message and exit
     """
     parser = ArgumentParser(prog=name, description="Run Wyvern Tools")
 
@@ -30,6 +32,14 @@ def main(name: str | None = None) -> None:
     )
     minimal_main.make_parser(minimal_parser)
 
+    scrub_parser = subparsers.add_parser(
+        "scrub",
+        help="Check the files downloaded by a plugin",
+    )
+    scrub.make_parser(scrub_parser)
+
     args = parser.parse_args()
     if args.cmd == "minimal":
         minimal_main.run_main(args)
+    elif args.cmd == "scrub":
+        scrub.run_main(args)
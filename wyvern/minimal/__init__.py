@@ -4,6 +4,7 @@ Minimal implementation of wyvern.
 Entries include
 
 * :class:`Manager` Basic manager implementation
+* :class:`.async_manager.AsyncManager` Manager running jobs on asyncio
 * :func:`.main.main` Main function
 """
 
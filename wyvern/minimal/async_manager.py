@@ -0,0 +1,234 @@
+"""Asyncio Manager Class."""
+
+import asyncio
+import logging
+import threading
+from collections import Counter
+from contextlib import suppress
+from typing import TYPE_CHECKING
+
+from alive_progress import alive_bar
+
+from wyvern.abstract import DataStore, Job
+from wyvern.minimal.journal import Journal
+from wyvern.minimal.manager import MinimalManager
+from wyvern.minimal.progress import format_size
+from wyvern.minimal.scheduling import SchedulingPolicy
+from wyvern.network import AsyncSession, Bandwidth
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is an optional dependency
+    aiohttp = None
+
+
+class AsyncManager(MinimalManager):
+    """
+    Manager running jobs on an asyncio event loop.
+
+    Jobs which override :meth:`~wyvern.abstract.Job.do_download_async` run as
+    tasks on the event loop, so up to ``max_tasks`` (or the ``TASKS``
+    configuration key, or 100) of them can wait on the network at once
+    without a thread each. Other jobs are run in the pools of threads for
+    their resource, as in :class:`~wyvern.minimal.manager.MinimalManager`.
+
+    If :mod:`aiohttp` is installed, :attr:`async_session` is a session for
+    async jobs to make their requests with. It shares the host limits,
+    statistics (so the ``adaptive`` controller sees its requests) and cache of
+    :attr:`session`. Otherwise it is None, and jobs should fall back to
+    :meth:`~wyvern.abstract.Job.do_download`.
+
+    Sub jobs put by tasks are never held back by ``sub_job_limit``, as
+    blocking would stop the event loop.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: "AsyncManager",
+        plugin_id: str,
+        constructor: type[DataStore],
+        max_workers: int | None = None,
+        journal: Journal | None = None,
+        queue_size: int | None = None,
+        *,
+        max_tasks: int | None = None,
+        bandwidth: Bandwidth | None = None,
+        adaptive: bool | None = None,
+        schedule: str | SchedulingPolicy | None = None,
+    ) -> "AsyncManager":
+        """
+        Create the object.
+
+        :param plugin_id: The ID of the Factory or Artisan providing jobs.
+        :param constructor: The DataStore used for configuration and secrets.
+        :param max_workers: The number of threads for jobs which are not
+            async.
+        :param journal: Where to record the jobs for resuming.
+        :param queue_size: The number of added jobs which can wait to start.
+        :param max_tasks: The number of jobs to run at the same time.
+        :param bandwidth: The bandwidth limit of the whole run.
+        :param adaptive: Adjust the number of network threads automatically.
+        :param schedule: The order to start jobs in.
+        """
+        super().__init__(
+            plugin_id,
+            constructor,
+            max_workers,
+            journal,
+            queue_size,
+            bandwidth=bandwidth,
+            adaptive=adaptive,
+            schedule=schedule,
+        )
+        if max_tasks is None:
+            max_tasks = int(self.configuration["TASKS"] or 100)
+        self.max_tasks = max(max_tasks, sum(self._pool_sizes.values()))
+
+        self.async_session: AsyncSession | None = None
+        """HTTP session for async jobs, if :mod:`aiohttp` is installed."""
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: threading.Thread | None = None
+        self._async_wake: asyncio.Event | None = None
+        self._pool_space: asyncio.Condition | None = None
+        self._in_pool: Counter[str] = Counter()
+        self._executors: dict[str, ThreadPoolExecutor] = {}
+        self._in_threads = 0
+
+    def do_jobs(self: "AsyncManager") -> None:
+        """Run the jobs on an event loop, outputting a progress bar."""
+        logging.info(
+            "Starting to process jobs with %d tasks and %d threads. There are "
+            "%d jobs in the queue.",
+            self.max_tasks,
+            self.max_workers,
+            self.job_queue.qsize(),
+        )
+
+        asyncio.run(self._run())
+
+        if self.journal is not None:
+            self.journal.close()
+
+    def put_sub_job(
+        self: "AsyncManager",
+        priority: int,
+        job: Job,
+        timeout: float | None = None,
+        resource: str = "network",
+    ) -> None:
+        """Queue a sub job, without blocking if called from a task."""
+        if threading.current_thread() is not self._loop_thread:
+            super().put_sub_job(priority, job, timeout, resource)
+            return
+        if self._seen_before(job):
+            return
+        with self._sub_job_space:
+            self._outstanding += 1
+        self._put(priority - 1, job, sub_job=True)
+
+    def _put(
+        self: "AsyncManager",
+        priority: int,
+        job: Job,
+        **kwargs: bool,
+    ) -> None:
+        """Add a job to the queue, waking the event loop."""
+        super()._put(priority, job, **kwargs)
+        if self._loop is not None:
+            with suppress(RuntimeError):  # The loop has already closed
+                self._loop.call_soon_threadsafe(self._async_wake.set)
+
+    async def _run(self: "AsyncManager") -> None:
+        """Run the jobs until the queue is empty and loading has finished."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.current_thread()
+        self._async_wake = asyncio.Event()
+        self._pool_space = asyncio.Condition()
+        self._executors = self._make_executors()
+        if aiohttp is not None:
+            self.async_session = AsyncSession(self.session, self.max_tasks)
+
+        running: dict[asyncio.Task, tuple[int, int, Job]] = {}
+        try:
+            with alive_bar(dual_line=True, title_length=40) as bar:
+                while running or not self.job_queue.empty() or self._loading():
+                    self._start_tasks(running)
+
+                    with suppress(TimeoutError):
+                        await asyncio.wait_for(
+                            self._async_wake.wait(),
+                            self.refresh_interval,
+                        )
+                    self._async_wake.clear()
+
+                    self._collect_jobs(running, bar)
+                    self._update_bar(running, bar)
+                    self._reload()
+                    self._adapt(running)
+
+                    # Let waiting jobs recheck the limits, which may have grown
+                    async with self._pool_space:
+                        self._pool_space.notify_all()
+        finally:
+            if self.async_session is not None:
+                await self.async_session.close()
+                self.async_session = None
+            self._shutdown(self._executors)
+            self._loop = None
+
+    def _start_tasks(
+        self: "AsyncManager",
+        running: dict[asyncio.Task, tuple[int, int, Job]],
+    ) -> None:
+        """Start jobs from the queue until ``max_tasks`` are running."""
+        while len(running) < self.max_tasks:
+            entry = self._next_job()
+            if entry is None:
+                break
+            task = asyncio.create_task(self._run_job(entry[2]))
+            task.add_done_callback(lambda _: self._async_wake.set())
+            running[task] = entry
+
+    async def _run_job(self: "AsyncManager", job: Job) -> None:
+        """Run a job as a task, or in a thread if it is not async."""
+        if type(job).do_download_async is not Job.do_download_async:
+            await job.do_download_async(self)
+            return
+
+        resource = self._resource(job)
+        async with self._pool_space:
+            await self._pool_space.wait_for(
+                lambda: self._can_start(resource, self._in_pool[resource]),
+            )
+            self._in_pool[resource] += 1
+        self._in_threads += 1
+        self._set_active(self._in_pool)
+        try:
+            await self._loop.run_in_executor(
+                self._executors[resource],
+                job.do_download,
+                self,
+            )
+        finally:
+            self._in_threads -= 1
+            async with self._pool_space:
+                self._in_pool[resource] -= 1
+                self._pool_space.notify_all()
+            self._set_active(self._in_pool)
+
+    def _update_bar(
+        self: "AsyncManager",
+        running: dict[asyncio.Task, tuple[int, int, Job]],
+        bar: object,
+    ) -> None:
+        """Show the progress of the active jobs and the total throughput."""
+        super()._update_bar(running, bar)
+        if len(running) != 1:
+            threads = sum(self.limits.values())
+            bar.title = (
+                f"{len(running)} tasks, {self._in_threads}/{threads} threads, "
+                f"{format_size(self.sampler.rate)}/s"
+            )
@@ -0,0 +1,152 @@
+"""
+Adaptive Concurrency.
+
+Finds the number of network workers giving the most throughput.
+"""
+
+import logging
+from collections import deque
+
+from requests import HTTPError, RequestException, codes
+
+from wyvern.network.limits import THROTTLE_STATUSES
+
+
+class ConcurrencyController:
+    """
+    Additive increase, multiplicative decrease controller of the workers.
+
+    Every :attr:`interval` seconds the manager reports how the last interval
+    went with :meth:`update`:
+
+    * If any request was throttled or failed, or the average latency of the
+      downloads from a host was more than :attr:`latency_factor` times the
+      lowest of the host's last :attr:`baseline_window` intervals, the hosts
+      are overloaded and :attr:`limit` is halved.
+    * If the last increase did not raise the throughput by
+      :attr:`min_gain`, the link is saturated and the increase is undone.
+    * Otherwise, one more worker is tried.
+
+    After a decrease, the limit is held for :attr:`hold` intervals so the
+    effect can be measured. Only intervals in which every worker was busy are
+    used, as an idle worker says nothing about the limit.
+
+    :param maximum: The most workers to use.
+    :param minimum: The fewest workers to use.
+    :param start: The number of workers to start with (defaults to a quarter
+        of the maximum).
+    """
+
+    interval: float = 2.0
+    """Time (in seconds) between updates."""
+
+    latency_factor: float = 2.0
+    """Rise in latency taken as a sign of overload."""
+
+    min_gain: float = 0.05
+    """Fraction the throughput must rise by for an extra worker to be kept."""
+
+    hold: int = 2
+    """Intervals to keep the limit the same for after decreasing it."""
+
+    baseline_window: int = 15
+    """
+    Intervals the lowest latency of a host is kept for.
+
+    Older latencies are forgotten, so a host which has become slower (eg
+    from a fast cache to a slow origin) is not taken as overloaded forever.
+    """
+
+    def __init__(
+        self: "ConcurrencyController",
+        maximum: int,
+        minimum: int = 1,
+        start: int | None = None,
+    ) -> "ConcurrencyController":
+        """Create the object."""
+        self.maximum = max(maximum, 1)
+        self.minimum = min(max(minimum, 1), self.maximum)
+        if start is None:
+            start = self.maximum // 4
+        self.limit = min(max(start, self.minimum), self.maximum)
+        """The number of workers to use."""
+
+        self._latencies: dict[str, deque[tuple[int, float]]] = {}
+        self._updates = 0
+        self._rate_before: float | None = None
+        self._holding = 0
+
+    def update(
+        self: "ConcurrencyController",
+        rate: float,
+        errors: int,
+        latencies: dict[str, float],
+    ) -> int:
+        """
+        Adjust the limit from the last interval.
+
+        :param rate: The bytes per second downloaded.
+        :param errors: The requests throttled or failed.
+        :param latencies: The average seconds waited for the response to a
+            download, for each host downloaded from.
+        :returns: The new limit.
+        """
+        overloaded = errors > 0
+        for host, latency in latencies.items():
+            if latency > self.latency_factor * self._baseline(host, latency):
+                overloaded = True
+        self._updates += 1
+        saturated = self._rate_before is not None and rate < (
+            self._rate_before * (1 + self.min_gain)
+        )
+
+        if overloaded:
+            self._set(self.limit // 2, "overloaded")
+            self._rate_before = None
+            self._holding = self.hold
+        elif self._holding:
+            self._holding -= 1
+        elif saturated:
+            self._set(self.limit - 1, "saturated")
+            self._rate_before = None
+            self._holding = self.hold
+        elif self.limit < self.maximum:
+            self._rate_before = rate
+            self._set(self.limit + 1, "increasing")
+        return self.limit
+
+    def _baseline(
+        self: "ConcurrencyController",
+        host: str,
+        latency: float,
+    ) -> float:
+        """Get the lowest recent latency of a host, and add the new one."""
+        window = self._latencies.setdefault(host, deque())
+        while window and window[0][0] <= self._updates - self.baseline_window:
+            window.popleft()
+        baseline = min((old for _, old in window), default=latency)
+        window.append((self._updates, latency))
+        return baseline
+
+    def _set(self: "ConcurrencyController", limit: int, reason: str) -> None:
+        """Change the limit, keeping it within the bounds."""
+        limit = min(max(limit, self.minimum), self.maximum)
+        if limit != self.limit:
+            logging.info("Using %d workers (%s)", limit, reason)
+        self.limit = limit
+
+
+def is_overload(error: BaseException) -> bool:
+    """
+    Check if a job's exception is a sign of the hosts being overloaded.
+
+    These are requests which failed to connect or timed out, and throttled
+    (429) or server error (5xx) responses. Other errors (eg bad data, or
+    a failed checksum) say nothing about the load.
+    """
+    if isinstance(error, HTTPError):
+        status = getattr(error.response, "status_code", None)
+        return status is not None and (
+            status in THROTTLE_STATUSES or status >= codes.internal_server_error
+        )
+    return isinstance(error, RequestException)
@@ -0,0 +1,259 @@
+"""
+Job Journal.
+
+Records the jobs in a manager's queue, so an interrupted run can be resumed.
+"""
+
+import importlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from threading import Lock
+
+from wyvern.abstract import Job
+
+
+class Journal:
+    """
+    Append-only journal of a manager's jobs.
+
+    Each line is a JSON record of a job being queued (with the output of
+    :meth:`~wyvern.abstract.Job.serialize`), started, completed or failed.
+    Records are flushed as soon as they are written, so they survive the
+    program being killed, and are synced to disk at most every
+    :attr:`sync_interval` seconds. A line torn by a crash is ignored.
+
+    Jobs which were queued but have not completed can be recreated with
+    :meth:`pending`. Jobs which failed are included so they are tried again.
+
+    Once every job has been loaded (eg by a Factory), :meth:`all_loaded`
+    records it. If the run was interrupted before then, the jobs have to be
+    loaded again, and :attr:`completed_keys` has the :meth:`key` of every job
+    which completed, so they are not run twice. A journal of a run which
+    loaded and finished every job is treated as empty, so the next run
+    starts afresh.
+
+    :param path: The path to the journal file.
+    """
+
+    sync_interval: float = 1.0
+    """Longest time (in seconds) between syncing records to disk."""
+
+    def __init__(self: "Journal", path: Path) -> "Journal":
+        """Create the object."""
+        self.path = Path(path)
+        self._lock = Lock()
+        self._file = None
+        self._last_sync = 0.0
+
+        self.loaded = False
+        """Whether every job had been loaded (set by :meth:`pending`)."""
+
+        self.completed_keys: set[str] = set()
+        """Keys of the jobs which completed (set by :meth:`pending`)."""
+
+    @staticmethod
+    def key(job_type: str, data: dict) -> str:
+        """Make the key identifying a job, from its type and serialized data."""
+        return json.dumps(
+            [job_type, data],
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def job_key(cls: type["Journal"], job: Job) -> str | None:
+        """Make the key identifying a job, or None if it can't be restored."""
+        data = job.serialize()
+        if data is None:
+            return None
+        job_type = type(job)
+        try:
+            return cls.key(_type_name(job_type), data)
+        except (TypeError, ValueError):
+            return None
+
+    def pending(self: "Journal") -> list[tuple[int, Job]]:
+        """
+        Recreate the jobs which were queued but did not complete.
+
+        This also reads whether every job had been loaded into
+        :attr:`loaded`, and the jobs which completed into
+        :attr:`completed_keys`. If every job had been loaded and none are
+        left, the run finished, and both are reset for a fresh run.
+
+        :returns: A list of ``(priority, job)`` in the order they were queued.
+        """
+        self.loaded = False
+        self.completed_keys = set()
+        try:
+            with self.path.open() as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+
+        records = self._replay(lines)
+        if self.loaded and not records:
+            self.loaded = False
+            self.completed_keys = set()
+            return []
+
+        jobs = []
+        for record in records.values():
+            try:
+                module_name, class_name = record["type"].rsplit(".", 1)
+                module = importlib.import_module(module_name)
+                job = getattr(module, class_name).deserialize(record["data"])
+            except (ImportError, AttributeError, KeyError):
+                logging.exception("Cannot restore %s job", record["type"])
+                continue
+            if job is None:
+                logging.error("Cannot restore %s job", record["type"])
+                continue
+            jobs.append((record["priority"], job))
+        return jobs
+
+    def _replay(self: "Journal", lines: list[str]) -> dict[int, dict]:
+        """Find the queued records of the jobs which did not complete."""
+        records: dict[int, dict] = {}
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning("Ignoring damaged journal entry: %s", line)
+                continue
+            if record["op"] == "queued":
+                records[record["id"]] = record
+            elif record["op"] == "completed":
+                done = records.pop(record["id"], None)
+                if done is not None:
+                    key = self.key(done["type"], done["data"])
+                    self.completed_keys.add(key)
+            elif record["op"] == "done":
+                self.completed_keys.add(record["key"])
+            elif record["op"] == "loaded":
+                self.loaded = True
+        return records
+
+    def start(self: "Journal", jobs: list[tuple[int, int, Job]]) -> None:
+        """
+        Start a new journal.
+
+        The existing journal is atomically replaced with one containing only
+        ``jobs`` (``(priority, id, job)`` entries already in the queue), so a
+        crash while starting cannot lose them. If the jobs have not all been
+        loaded, the keys of the completed jobs are kept too.
+        """
+        with self._lock:
+            self.close()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with NamedTemporaryFile(
+                "w",
+                dir=self.path.parent,
+                prefix=f".{self.path.name}.",
+                delete=False,
+            ) as f:
+                if self.loaded:
+                    f.write(self._record("loaded"))
+                else:
+                    f.writelines(
+                        self._record("done", key=key)
+                        for key in sorted(self.completed_keys)
+                    )
+                for priority, job_id, job in jobs:
+                    record = self._queued_record(job_id, priority, job)
+                    if record is not None:
+                        f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+            Path(f.name).replace(self.path)
+            self._file = self.path.open("a")
+
+    def queued(self: "Journal", job_id: int, priority: int, job: Job) -> None:
+        """Record a job being added to the queue."""
+        record = self._queued_record(job_id, priority, job)
+        if record is not None:
+            self._write(record)
+
+    def started(self: "Journal", job_id: int) -> None:
+        """Record a job being started."""
+        self._write(self._record("started", job_id))
+
+    def completed(self: "Journal", job_id: int) -> None:
+        """Record a job completing (or being skipped)."""
+        self._write(self._record("completed", job_id))
+
+    def failed(self: "Journal", job_id: int, error: BaseException) -> None:
+        """Record a job raising an exception."""
+        self._write(self._record("failed", job_id, error=repr(error)))
+
+    def all_loaded(self: "Journal") -> None:
+        """Record every job having been loaded."""
+        self._write(self._record("loaded"))
+
+    def close(self: "Journal") -> None:
+        """Sync and close the journal."""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _queued_record(
+        self: "Journal",
+        job_id: int,
+        priority: int,
+        job: Job,
+    ) -> str | None:
+        """Create the record for a job, or None if it can't be restored."""
+        data = job.serialize()
+        if data is None:
+            return None
+        try:
+            return self._record(
+                "queued",
+                job_id,
+                priority=priority,
+                type=_type_name(type(job)),
+                data=data,
+            )
+        except (TypeError, ValueError):
+            logging.debug("Cannot journal %s", job.name, exc_info=True)
+            return None
+
+    def _record(
+        self: "Journal",
+        op: str,
+        job_id: int | None = None,
+        **kwargs: dict,
+    ) -> str:
+        """Create a line of the journal."""
+        if job_id is not None:
+            kwargs = {"id": job_id, **kwargs}
+        return (
+            json.dumps(
+                {"op": op, **kwargs},
+                separators=(",", ":"),
+            )
+            + "\n"
+        )
+
+    def _write(self: "Journal", record: str) -> None:
+        """Append a line to the journal."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(record)
+            self._file.flush()
+            now = time.monotonic()
+            if now - self._last_sync >= self.sync_interval:
+                os.fsync(self._file.fileno())
+                self._last_sync = now
+
+
+def _type_name(job_type: type[Job]) -> str:
+    """Get the name a job's class is imported by."""
+    return f"{job_type.__module__}.{job_type.__qualname__}"
@@ -2,13 +2,38 @@
 
 import importlib
 import logging
+import sys
 from argparse import ArgumentParser, Namespace
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
 
 import coloredlogs
 
-from wyvern.abstract import Artisan, Factory
-from wyvern.data_store import YamlDataStore
+from wyvern.abstract import Artisan, Factory, Manager
+from wyvern.data_store import (
+    CachedYamlDataStore,
+    SqliteDataStore,
+    YamlDataStore,
+)
+from wyvern.minimal.async_manager import AsyncManager
+from wyvern.minimal.journal import Journal
 from wyvern.minimal.manager import MinimalManager
+from wyvern.minimal.scheduling import POLICIES
+from wyvern.network import Bandwidth, parse_rate
+
+DATA_STORES = {
+    "yaml": YamlDataStore,
+    "cached-yaml": CachedYamlDataStore,
+    "sqlite": SqliteDataStore,
+}
+"""DataStores which can be selected with ``--data-store``."""
+
+ENGINES = {
+    "threads": MinimalManager,
+    "asyncio": AsyncManager,
+}
+"""Managers which can be selected with ``--engine``."""
 
 
 def make_parser(parser: ArgumentParser) -> None:
@@ -28,49 +53,223 @@ def make_parser(parser: ArgumentParser) -> None:
         help="The String to pass into the artisan",
         nargs="?",
     )
+    parser.add_argument(
+        "--batch",
+        type=str,
+        metavar="FILE",
+        help="Pass each line of this file (or stdin, if it is -) into the "
+        "artisan instead of job_str. Duplicate and blank lines, and lines "
+        "starting with #, are skipped",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="The number of jobs to download at the same time (defaults to "
+        "the WORKERS configuration, or 1)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        help="The number of loaded jobs which can wait to be downloaded "
+        "before loading pauses (defaults to the QUEUE_SIZE configuration, or "
+        "8 per worker, and at least 1024 when ordering by size or publisher)",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        default=None,
+        help="Adjust the number of download workers automatically, up to "
+        "--workers (default: the ADAPTIVE_WORKERS configuration)",
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=parse_rate,
+        help="Limit on the bytes per second downloaded (eg 500K or 2M), "
+        "shared between the downloads",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="threads",
+        help="How to run the jobs. asyncio runs jobs supporting it as tasks, "
+        "and the rest in the worker threads (default: threads)",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=POLICIES,
+        metavar="POLICY",
+        help="The order to download jobs in: depth-first, breadth-first, "
+        "smallest-first, largest-first or round-robin (by publisher). Sizes "
+        "and publishers are only known for some plugins. Only the jobs "
+        "waiting in the queue are reordered, so the last three order "
+        "--queue-size jobs at a time (at least 1024 unless set) rather than "
+        "the whole library (default: the SCHEDULE configuration, or "
+        "depth-first)",
+    )
+    parser.add_argument(
+        "--data-store",
+        choices=DATA_STORES,
+        default="yaml",
+        help="How to store the configuration and secrets (default: yaml)",
+    )
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        help="Record jobs in this file. If it has jobs left from an "
+        "interrupted run, they are resumed instead of loading the jobs again",
+    )
 
 
-def run_main(args: Namespace) -> None:
+def load_plugin(name: str) -> object | None:
     """
-    Run the main function.
+    Create a plugin (eg a Factory or Artisan) from its class.
 
-    :param args: The Parsed Arguments
+    :param name: The module and class (eg ``wyvern.plugins.itchio.Class``).
+    :returns: The plugin, or None if it cannot be created (the error is
+        logged).
     """
-    coloredlogs.install(
-        level="INFO",
-        fmt="[%(asctime)s] %(levelname)s - %(message)s",
-    )
-
     try:
-        module_name, class_name = args.downloader.rsplit(".", 1)
+        module_name, class_name = name.rsplit(".", 1)
     except ValueError:
         logging.exception("Downloader must contain module and class")
+        return None
 
     try:
         module = importlib.import_module(module_name)
         class_constructor = getattr(module, class_name)
     except ImportError:
         logging.exception("Cannot load module %s", module_name)
-        return
+        return None
     except AttributeError:
         logging.exception("Cannot find class %s in %s", class_name, module_name)
-        return
+        return None
 
     try:
-        creator = class_constructor()
+        return class_constructor()
     except TypeError:
         logging.exception(
             "%s encountered an error in the constructor. This is normally if"
             "the constructor takes arguments.",
             class_name,
         )
+        return None
+
+
+def read_job_strs(path: str) -> Iterator[str]:
+    """
+    Read the job strings from a batch file, one per line.
+
+    Lines are read as they are needed, so a long file (or a pipe) does not
+    have to be read before the first job starts.
+
+    :param path: The file, or ``-`` for stdin.
+    :returns: The job strings, without duplicates, blank lines or comments.
+    """
+    seen = set()
+    with (
+        Path(path).open(encoding="utf-8") if path != "-" else sys.stdin
+    ) as lines:
+        for line in lines:
+            job_str = line.strip()
+            if not job_str or job_str.startswith("#") or job_str in seen:
+                continue
+            seen.add(job_str)
+            yield job_str
+
+
+def request_jobs(
+    artisan: Artisan,
+    manager: Manager,
+    job_strs: Iterable[str],
+) -> None:
+    """
+    Request a job from an artisan for each job string.
+
+    ``REQUEST_WORKERS`` (default 8) requests are made at the same time, all
+    with the same artisan, and each job is added to the manager as soon as
+    its request returns.
+
+    :param artisan: The artisan to request the jobs from.
+    :param manager: The manager to add the jobs to.
+    :param job_strs: The job strings (eg from :func:`read_job_strs`).
+    """
+    workers = max(int(manager.configuration["REQUEST_WORKERS"] or 8), 1)
+    pending: dict[Future, str] = {}
+    found = failed = 0
+
+    def add_jobs() -> None:
+        nonlocal found, failed
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            job_str = pending.pop(future)
+            try:
+                job = future.result()
+            except Exception:
+                logging.exception("Failed to request job for %s", job_str)
+                job = None
+            if job is None:
+                failed += 1
+                continue
+            found += 1
+            manager.add_job(job)
+
+    with ThreadPoolExecutor(workers, thread_name_prefix="request") as ex:
+        for job_str in job_strs:
+            pending[ex.submit(artisan.request_job, manager, job_str)] = job_str
+            if len(pending) >= 2 * workers:
+                add_jobs()
+        while pending:
+            add_jobs()
+
+    logging.info("Requested %d jobs, %d could not be found", found, failed)
+
+
+def run_main(args: Namespace) -> None:
+    """
+    Run the main function.
+
+    :param args: The Parsed Arguments
+    """
+    coloredlogs.install(
+        level="INFO",
+        fmt="[%(asctime)s] %(levelname)s - %(message)s",
+    )
+
+    creator = load_plugin(args.downloader)
+    if creator is None:
         return
+    class_name = type(creator).__name__
+
+    manager = ENGINES[args.engine](
+        creator.plugin_id,
+        DATA_STORES[args.data_store],
+        args.workers,
+        Journal(args.journal) if args.journal else None,
+        args.queue_size,
+        bandwidth=Bandwidth(args.bandwidth),
+        adaptive=args.adaptive,
+        schedule=args.schedule,
+    )
 
-    manager = MinimalManager(creator.plugin_id, YamlDataStore)
+    resumed = manager.resume()
+    if resumed:
+        logging.info("Resumed %d jobs from %s", resumed, args.journal)
 
     if isinstance(creator, Factory):
-        logging.info("Loading jobs from %s", class_name)
-        creator.load_jobs(manager)
+        if manager.needs_loading():
+            logging.info("Loading jobs from %s", class_name)
+            manager.produce(creator.load_jobs)
+    elif isinstance(creator, Artisan) and args.batch is not None:
+        if manager.needs_loading():
+            logging.info("Loading jobs from %s", class_name)
+            manager.produce(
+                lambda manager: request_jobs(
+                    creator,
+                    manager,
+                    read_job_strs(args.batch),
+                ),
+            )
     elif isinstance(creator, Artisan):
         if args.job_str is None:
             logging.error("Job string cannot be none for an artisan.")
@@ -87,16 +286,60 @@ def main(name: str | None = None) -> None:
     """
     Run the Minimal Downloader.
 
-    usage: python -m wyvern.minimal [-h] downloader [job_str]
+    usage: python -m wyvern.minimal [-h] [--batch FILE] [-w WORKERS]
+                                    [--queue-size QUEUE_SIZE] [--adaptive]
+                                    [--bandwidth BANDWIDTH]
+                                    [--engine {threads,asyncio}]
+                                    [--schedule POLICY]
+                                    [--data-store {yaml,cached-yaml,sqlite}]
+                                    [--journal JOURNAL]
+                                    downloader [job_str]
 
     Run The Minimal Downloader
 
     positional arguments:
-      downloader  The Downloader class (Factory or Artisan)
-      job_str     The String to pass into the artisan
+      downloader            The Downloader class (Factory or Artisan)
+      job_str               The String to pass into the artisan
 
     options:
-      -h, --help  show this help message and exit
+      -h, --help            show this help message and exit
+      --batch FILE          Pass each line of this file (or stdin, if it is -)
+                            into the artisan instead of job_str. Duplicate and
+                            blank lines, and lines starting with #, are
+                            skipped
+      -w WORKERS, --workers WORKERS
+                            The number of jobs to download at the same time
+                            (defaults to the WORKERS configuration, or 1)
+      --queue-size QUEUE_SIZE
+                            The number of loaded jobs which can wait to be
+                            downloaded before loading pauses (defaults to the
+                            QUEUE_SIZE configuration, or 8 per worker, and at
+                            least 1024 when ordering by size or publisher)
+      --adaptive            Adjust the number of download workers
+                            automatically, up to --workers (default: the
+                            ADAPTIVE_WORKERS configuration)
+      --bandwidth BANDWIDTH
+                            Limit on the bytes per second downloaded (eg 500K
+                            or 2M), shared between the downloads
+      --engine {threads,asyncio}
+                            How to run the jobs. asyncio runs jobs supporting
+                            it as tasks, and the rest in the worker threads
+                            (default: threads)
+      --schedule POLICY     The order to download jobs in: depth-first,
+                            breadth-first, smallest-first, largest-first or
+                            round-robin (by publisher). Sizes and publishers
+                            are only known for some plugins. Only the jobs
+                            waiting in the queue are reordered, so the last
+                            three order --queue-size jobs at a time (at least
+                            1024 unless set) rather than the whole library
+                            (default: the SCHEDULE configuration, or depth-
+                            first)
+      --data-store {yaml,cached-yaml,sqlite}
+                            How to store the configuration and secrets
+                            (default: yaml)
+      --journal JOURNAL     Record jobs in this file. If it has jobs left from
+                            an interrupted run, they are resumed instead of
+                            loading the jobs again
     """
     parser = ArgumentParser(prog=name, description="Run The Minimal Downloader")
 
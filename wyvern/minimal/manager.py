@@ -1,13 +1,60 @@
 """Minimal Manager Class."""
 
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import os
+import time
+from collections import Counter
+from collections.abc import Callable, Collection
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from itertools import count
-from queue import PriorityQueue
+from pathlib import Path
+from queue import Full, Queue
+from threading import Condition, Event, Lock, Semaphore, Thread, current_thread
+from typing import TypeVar
 
 from alive_progress import alive_bar
 
 from wyvern.abstract import DataStore, Job, Manager
+from wyvern.minimal.concurrency import ConcurrencyController, is_overload
+from wyvern.minimal.journal import Journal
+from wyvern.minimal.progress import ProgressSampler, format_size
+from wyvern.minimal.scheduling import (
+    POLICIES,
+    Entry,
+    ScheduledQueue,
+    SchedulingPolicy,
+)
+from wyvern.network import (
+    Bandwidth,
+    HostLimits,
+    HttpCache,
+    make_session,
+    parse_rate,
+)
+
+T = TypeVar("T")
+
+
+def make_process_pool(max_workers: int | None = None) -> ProcessPoolExecutor:
+    """
+    Create a pool of processes, started from a fork server if possible.
+
+    Forking copies the locks held by other threads (eg the progress bar's),
+    which can deadlock the new process, so the processes are started from a
+    fork server, or spawned where there is none.
+
+    :param max_workers: The number of processes (defaults to the CPUs).
+    """
+    method = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+    return ProcessPoolExecutor(
+        max_workers,
+        mp_context=multiprocessing.get_context(method),
+    )
 
 
 class MinimalManager(Manager):
@@ -15,83 +62,588 @@ class MinimalManager(Manager):
     Minimal implementation of a manager.
 
     This class only supports jobs from one loader and is designed for use with
-    the minimal program as a proof-of-concept for the project. It downloads one
-    job at a time in a background thread, updating a console progress bar with
-    the status.
+    the minimal program as a proof-of-concept for the project. It downloads
+    jobs in a pool of background threads for each
+    :attr:`~wyvern.abstract.Job.resource`, updating a console progress bar
+    with the status of every active job.
+
+    Its configuration keys (eg ``WORKERS``, ``BANDWIDTH`` and
+    ``HOST_LIMITS``) are listed in :doc:`/configuration`.
     """
 
-    def __init__(
+    refresh_interval: float = 0.1
+    """Longest time (in seconds) between progress bar refreshes."""
+
+    reload_interval: float = 5.0
+    """Time (in seconds) between reading settings which can change."""
+
+    def __init__(  # noqa: PLR0913
         self: "MinimalManager",
         plugin_id: str,
         constructor: type[DataStore],
+        max_workers: int | None = None,
+        journal: Journal | None = None,
+        queue_size: int | None = None,
+        *,
+        bandwidth: Bandwidth | None = None,
+        adaptive: bool | None = None,
+        schedule: str | SchedulingPolicy | None = None,
     ) -> "MinimalManager":
         """
         Create the object.
 
         :param plugin_id: The ID of the Factory or Artisan providing jobs.
+        :param constructor: The DataStore used for configuration and secrets.
+        :param max_workers: The number of jobs to download at the same time.
+        :param journal: Where to record the jobs for resuming.
+        :param queue_size: The number of added jobs which can wait to start.
+        :param bandwidth: The bandwidth limit of the whole run.
+        :param adaptive: Adjust the number of network workers automatically.
+        :param schedule: The order to start jobs in.
         """
         self.plugin_id = plugin_id
-        self.job_queue: PriorityQueue[(int, int, Job)] = PriorityQueue()
         self.configuration = constructor(plugin_id, "configuration.yaml")
         self.secrets = constructor(plugin_id, "secrets.yaml")
+        if schedule is None:
+            schedule = self.configuration["SCHEDULE"] or "depth-first"
+        if isinstance(schedule, str):
+            schedule = POLICIES[schedule]()
+        self.job_queue = ScheduledQueue(schedule, self._resource)
         self.unique = count()
+        self.journal = journal
+        self._previous: set[str] = set()
+        self.sampler = ProgressSampler()
+        self._wake = Event()
+
+        if adaptive is None:
+            adaptive = bool(self.configuration["ADAPTIVE_WORKERS"])
+        if max_workers is None:
+            max_workers = int(
+                self.configuration["WORKERS"] or (16 if adaptive else 1),
+            )
+        self.max_workers = max(max_workers, 1)
+
+        self.limits = {
+            "network": self.max_workers,
+            "subprocess": int(
+                self.configuration["SUBPROCESS_WORKERS"] or self.max_workers,
+            ),
+            "disk": int(self.configuration["DISK_WORKERS"] or 2),
+            "cpu": int(
+                self.configuration["CPU_WORKERS"] or os.cpu_count() or 1,
+            ),
+        }
+        """The number of jobs of each resource which can run at once."""
+        self._pool_sizes = dict(self.limits)
+        self._processes_lock = Lock()
+        self._processes: ProcessPoolExecutor | None = self._make_processes()
+
+        if queue_size is None:
+            queue_size = int(
+                self.configuration["QUEUE_SIZE"]
+                or max(8 * self.max_workers, schedule.lookahead),
+            )
+        self.queue_size = max(queue_size, 1)
+        self._slots = Semaphore(self.queue_size)
+        self._holding: set[int] = set()
+        self._producer: Thread | None = None
+
+        self.sub_job_limit = 2 * self.max_workers
+        """The number of sub jobs which can wait to start."""
+        self._sub_jobs: set[int] = set()
+        self._sub_job_space = Condition()
+        self._outstanding = 0
+        self._blocked: Counter[str] = Counter()
+        self._active: Counter[str] = Counter()
+
+        self.controller = None
+        if adaptive:
+            self.controller = ConcurrencyController(self.max_workers)
+            self.limits["network"] = self.controller.limit
+        self._adapted = (0.0, 0, (0, 0, 0, 0.0), {})
+        self._failures = 0
+
+        self.bandwidth = Bandwidth(parent=bandwidth)
+        self._reloaded = 0.0
+        self._reload()
+
+        # Leave room for jobs downloading over several connections
+        self.session = make_session(
+            pool_maxsize=4 * sum(self._pool_sizes.values()),
+            limits=HostLimits(self.configuration["HOST_LIMITS"] or None),
+            cache=self._make_cache(),
+        )
+
+    def _make_cache(self: "MinimalManager") -> HttpCache | None:
+        """Open the HTTP cache, unless it is turned off."""
+        size = self.configuration["HTTP_CACHE_SIZE"]
+        size = 64 << 20 if size in {None, ""} else int(size)
+        if size <= 0:
+            return None
+        return HttpCache(Path(self.plugin_id) / ".http-cache.sqlite3", size)
 
     def add_job(self: "MinimalManager", job: Job | None) -> None:
-        """Add a job to the end of the queue."""
-        if Job:
-            self.job_queue.put((0, next(self.unique), job))
+        """
+        Add a job to the end of the queue.
+
+        When called from the thread started by :meth:`produce`, blocks while
+        ``queue_size`` added jobs are waiting to start. Jobs added from other
+        threads are never held back, as nothing may be taking jobs yet.
+        """
+        if job and not self._seen_before(job):
+            holding = self._slots.acquire(
+                blocking=current_thread() is self._producer,
+            )
+            self._put(0, job, holding=holding)
+
+    def produce(
+        self: "MinimalManager",
+        load_jobs: Callable[[Manager], None],
+    ) -> None:
+        """
+        Load jobs in the background while :meth:`do_jobs` runs them.
+
+        :param load_jobs: Called with the manager to add the jobs (eg
+            :meth:`~wyvern.abstract.Factory.load_jobs`).
+        """
+
+        def run() -> None:
+            try:
+                load_jobs(self)
+            except Exception:
+                logging.exception("Failed to load jobs")
+            else:
+                if self.journal is not None:
+                    self.journal.all_loaded()
+            finally:
+                self._wake.set()
+
+        self._producer = Thread(target=run, name="producer", daemon=True)
+        self._producer.start()
+
+    def resume(self: "MinimalManager") -> int:
+        """
+        Queue the jobs left unfinished in the journal.
+
+        This also starts the journal for this run, so must be called before
+        any jobs are added. Jobs added again later (eg by a restarted parent)
+        are passed over if they were restored, or, if the run had not loaded
+        every job, if they completed.
+
+        :returns: The number of jobs restored.
+        """
+        if self.journal is None:
+            return 0
+        entries = [
+            (priority, next(self.unique), job)
+            for priority, job in self.journal.pending()
+        ]
+        self.journal.start(entries)
+        # Restarted parents would put the restored sub jobs again
+        self._previous = {Journal.job_key(job) for _, _, job in entries}
+        if not self.journal.loaded:
+            self._previous |= self.journal.completed_keys
+        for entry in entries:
+            self.job_queue.put(entry)
+        return len(entries)
+
+    def needs_loading(self: "MinimalManager") -> bool:
+        """
+        Check if the jobs have to be loaded (eg by a Factory).
+
+        They do unless :meth:`resume` restored an unfinished run which had
+        loaded them all, and which so has every job left in its journal.
+        """
+        return self.journal is None or not self.journal.loaded
+
+    def _seen_before(self: "MinimalManager", job: Job) -> bool:
+        """Check if a job was queued or completed by the resumed run."""
+        if not self._previous or Journal.job_key(job) not in self._previous:
+            return False
+        logging.debug("Already queued or completed: %s", job.name)
+        return True
+
+    def put_sub_job(
+        self: "MinimalManager",
+        priority: int,
+        job: Job,
+        timeout: float | None = None,
+        resource: str = "network",
+    ) -> None:
+        """
+        Queue a sub job ahead of the jobs at its parent's ``priority``.
+
+        Blocks while ``sub_job_limit`` sub jobs are waiting to start, and
+        the parent's pool has threads to run other jobs in its place.
+
+        :param resource: The pool the parent is running in.
+        :raises queue.Full: If there was no space within ``timeout`` seconds.
+        """
+        if self._seen_before(job):
+            return
+        with self._sub_job_space:
+            self._blocked[resource] += 1
+            self._wake.set()  # Start another job while this one waits
+            try:
+                has_space = self._sub_job_space.wait_for(
+                    lambda: self._outstanding < self.sub_job_limit
+                    or self._blocked[resource] >= self._pool_sizes[resource]
+                    or self._blocked[resource] >= self._active[resource],
+                    timeout,
+                )
+            finally:
+                self._blocked[resource] -= 1
+            if not has_space:
+                raise Full
+            self._outstanding += 1
+        self._put(priority - 1, job, sub_job=True)
+
+    def _put(
+        self: "MinimalManager",
+        priority: int,
+        job: Job,
+        *,
+        holding: bool = False,
+        sub_job: bool = False,
+    ) -> None:
+        """
+        Add a job to the queue, recording it in the journal.
+
+        :param holding: The job holds a queue slot until it is started.
+        :param sub_job: The job counts towards ``sub_job_limit`` until it is
+            started.
+        """
+        job_id = next(self.unique)
+        if holding:
+            self._holding.add(job_id)
+        if sub_job:
+            self._sub_jobs.add(job_id)
+        if self.journal is not None:
+            self.journal.queued(job_id, priority, job)
+        self.job_queue.put((priority, job_id, job))
+        self._wake.set()
+
+    def _loading(self: "MinimalManager") -> bool:
+        """Check if the producer is still adding jobs."""
+        return self._producer is not None and self._producer.is_alive()
 
     def do_jobs(self: "MinimalManager") -> None:
-        """Run the jobs in a background thread, outputting a progress bar."""
+        """Run the jobs in background threads, outputting a progress bar."""
         logging.info(
-            "Starting to process jobs. There are %d jobs in the queue.",
+            "Starting to process jobs with %d workers. There are %d jobs in "
+            "the queue.",
+            self.max_workers,
             self.job_queue.qsize(),
         )
 
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            while not self.job_queue.empty():
-                priority, _, job = self.job_queue.get()
-                if job.should_skip(self):
-                    logging.info("Skipping: %s", job.name)
-                    continue
-                self._process_job(job, priority, executor)
+        running: dict[Future, tuple[int, int, Job]] = {}
+        executors = self._make_executors()
+        try:
+            with alive_bar(dual_line=True, title_length=40) as bar:
+                while running or not self.job_queue.empty() or self._loading():
+                    self._start_jobs(running, executors)
+
+                    # Progress is sampled, so only finishing jobs wake us early
+                    self._wake.wait(self.refresh_interval)
+                    self._wake.clear()
+
+                    self._collect_jobs(running, bar)
+                    self._update_bar(running, bar)
+                    self._reload()
+                    self._adapt(running)
+        finally:
+            self._shutdown(executors)
 
-    def _process_job(
+        if self.journal is not None:
+            self.journal.close()
+
+    def _reload(self: "MinimalManager") -> None:
+        """Read the settings which can change while running, when due."""
+        now = time.monotonic()
+        if now - self._reloaded < self.reload_interval:
+            return
+        self._reloaded = now
+
+        try:
+            rate = parse_rate(self.configuration["BANDWIDTH"])
+        except ValueError:
+            logging.exception("Ignoring BANDWIDTH configuration")
+            return
+        if rate != self.bandwidth.rate:
+            logging.info("Bandwidth limit set to %s/s", format_size(rate or 0))
+            self.bandwidth.rate = rate
+
+    def _adapt(
         self: "MinimalManager",
-        job: Job,
-        priority: int,
-        executor: ThreadPoolExecutor,
+        running: dict[object, tuple[int, int, Job]],
+    ) -> None:
+        """Update the number of network workers, when due."""
+        if self.controller is None:
+            return
+        now = time.monotonic()
+        last, total, stats, downloads = self._adapted
+        elapsed = now - last
+        if elapsed < self.controller.interval:
+            return
+
+        adapter = self.session.get_adapter("https://")
+        new_stats = adapter.stats.snapshot()
+        _, throttled, failed, _ = (
+            new - old for new, old in zip(new_stats, stats, strict=True)
+        )
+        new_downloads = adapter.stats.download_latency()
+        self._adapted = (now, self.sampler.total, new_stats, new_downloads)
+        if not last:
+            return
+
+        latencies = {}
+        for host, (requests, latency) in new_downloads.items():
+            old_requests, old_latency = downloads.get(host, (0, 0.0))
+            if requests > old_requests:
+                latencies[host] = (latency - old_latency) / (
+                    requests - old_requests
+                )
+
+        busy = sum(
+            self._resource(job) == "network" for _, _, job in running.values()
+        )
+        errors = throttled + failed + self._failures
+        self._failures = 0
+        if busy < self.limits["network"] and not errors:
+            # Idle workers say nothing about whether more would help
+            return
+
+        self.limits["network"] = self.controller.update(
+            (self.sampler.total - total) / elapsed,
+            errors,
+            latencies,
+        )
+
+    def run_cpu(
+        self: "MinimalManager",
+        fn: Callable[..., T],
+        *args: object,
+    ) -> T:
+        """
+        Run ``fn(*args)`` in the pool of processes.
+
+        The pool has ``CPU_WORKERS`` processes, so the work does not compete
+        with the downloads for the GIL (see :func:`make_process_pool`).
+        """
+        with self._processes_lock:
+            if self._processes is None:
+                self._processes = self._make_processes()
+        return self._processes.submit(fn, *args).result()
+
+    def _make_processes(self: "MinimalManager") -> ProcessPoolExecutor:
+        """Create the pool of processes for :meth:`run_cpu`."""
+        return make_process_pool(self._pool_sizes["cpu"])
+
+    def _threads(self: "MinimalManager", resource: str) -> int:
+        """Get the number of threads in the pool of a resource."""
+        return 2 * self._pool_sizes[resource]
+
+    def _make_executors(
+        self: "MinimalManager",
+    ) -> dict[str, ThreadPoolExecutor]:
+        """
+        Create a pool of threads for each resource.
+
+        There are threads for twice the limit, to run jobs in place of those
+        blocked by :meth:`put_sub_job`.
+        """
+        return {
+            resource: ThreadPoolExecutor(
+                max_workers=self._threads(resource),
+                thread_name_prefix=resource,
+            )
+            for resource in self._pool_sizes
+        }
+
+    def _can_start(
+        self: "MinimalManager",
+        resource: str,
+        running: int,
+    ) -> bool:
+        """Check if a pool has room for a job, with ``running`` jobs in it."""
+        if running >= self._threads(resource):
+            return False
+        with self._sub_job_space:
+            blocked = self._blocked[resource]
+        return running - blocked < self.limits[resource]
+
+    def _shutdown(
+        self: "MinimalManager",
+        executors: dict[str, ThreadPoolExecutor],
     ) -> None:
-        def do_job() -> None:
-            job.do_download(self)
-            job.updated.set()
-
-        logging.info("Downloading: %s", job.name)
-        with alive_bar(
-            manual=True,
-            dual_line=True,
-            title_length=40,
-        ) as bar:
-            fut = executor.submit(do_job)
-            while not fut.done():
-                job.updated.wait()
-                job.updated.clear()
-
-                # Update Statuses
-                bar(job.progress)
-                bar.text = getattr(job, "status", "")
-                bar.title = job.name
+        """Wait for the pools of threads and processes to finish."""
+        for executor in executors.values():
+            executor.shutdown()
+        with self._processes_lock:
+            if self._processes is not None:
+                self._processes.shutdown()
+                self._processes = None
+
+    def _resource(self: "MinimalManager", job: Job) -> str:
+        """Get the pool a job is run in."""
+        resource = getattr(job, "resource", "network")
+        return resource if resource in self.limits else "network"
+
+    def _start_jobs(
+        self: "MinimalManager",
+        running: dict[Future, tuple[int, int, Job]],
+        executors: dict[str, ThreadPoolExecutor],
+    ) -> None:
+        """Fill the free workers with jobs from the queue."""
+        busy = Counter(self._resource(job) for _, _, job in running.values())
+        while True:
+            free = [r for r in self.limits if self._can_start(r, busy[r])]
+            if not free:
+                break
+            entry = self._next_job(free)
+            if entry is None:
+                break
+            resource = self._resource(entry[2])
+            busy[resource] += 1
+            fut = executors[resource].submit(entry[2].do_download, self)
+            fut.add_done_callback(lambda _: self._wake.set())
+            running[fut] = entry
+
+        self._set_active(busy)
+
+    def _next_job(
+        self: "MinimalManager",
+        resources: Collection[str] | None = None,
+    ) -> Entry | None:
+        """
+        Take the next job to start from the queue.
+
+        Jobs which should be skipped are recorded as completed and passed
+        over. Jobs for other pools than ``resources`` are left in the queue.
+
+        :returns: The ``(priority, id, job)`` entry, or None if there are no
+            jobs which can start.
+        """
+        while True:
+            entry = self.job_queue.get_first(resources)
+            if entry is None:
+                return None
+            priority, job_id, job = entry
+            if job_id in self._holding:
+                self._holding.remove(job_id)
+                self._slots.release()
+            if job_id in self._sub_jobs:
+                self._sub_jobs.remove(job_id)
+                with self._sub_job_space:
+                    self._outstanding -= 1
+                    self._sub_job_space.notify_all()
+            if job.should_skip(self):
+                logging.info("Skipping: %s", job.name)
+                if self.journal is not None:
+                    self.journal.completed(job_id)
+                continue
+
+            logging.info("Downloading: %s", job.name)
+            if self.journal is not None:
+                self.journal.started(job_id)
+            if isinstance(getattr(job, "sub_jobs", None), Queue):
+                # Sub jobs put before the job started are queued now
                 self._add_subjobs(job, priority)
+                job.sub_jobs = SubJobQueue(self, priority, self._resource(job))
+            return priority, job_id, job
+
+    def _set_active(self: "MinimalManager", active: Counter[str]) -> None:
+        """Update the running jobs in each pool for :meth:`put_sub_job`."""
+        with self._sub_job_space:
+            self._active = Counter(active)
+            self._sub_job_space.notify_all()
+
+    def _collect_jobs(
+        self: "MinimalManager",
+        running: dict[Future, tuple[int, int, Job]],
+        bar: object,
+    ) -> None:
+        """Remove finished jobs from the workers."""
+        for fut, (_, job_id, job) in list(running.items()):
+            if not fut.done():
+                continue
 
+            del running[fut]
+            self.sampler.finish(job)
+            bar()
             if fut.exception() is not None:
-                logging.exception(fut.exception())
+                logging.error(
+                    "Failed: %s",
+                    job.name,
+                    exc_info=fut.exception(),
+                )
+                self._failures += is_overload(fut.exception())
+                if self.journal is not None:
+                    self.journal.failed(job_id, fut.exception())
+            elif self.journal is not None:
+                self.journal.completed(job_id)
 
-    def _add_subjobs(self: "MinimalManager", job: Job, priority: int) -> None:
-        while getattr(job, "sub_jobs", None) and not job.sub_jobs.empty():
-            self.job_queue.put(
-                (
-                    priority - 1,
-                    next(self.unique),
-                    job.sub_jobs.get(),
-                ),
+    def _update_bar(
+        self: "MinimalManager",
+        running: dict[Future, tuple[int, int, Job]],
+        bar: object,
+    ) -> None:
+        """Show the progress of every active job and the total throughput."""
+        jobs = [job for _, _, job in running.values()]
+        self.sampler.sample(jobs)
+        rate = f"{format_size(self.sampler.rate)}/s"
+        if len(jobs) == 1:
+            job, *_ = jobs
+            bar.title = job.name
+            bar.text = f"{job.progress:.0%} {rate} {getattr(job, 'status', '')}"
+        else:
+            workers = sum(self.limits.values())
+            bar.title = f"{len(jobs)}/{workers} workers, {rate}"
+            bar.text = " | ".join(
+                f"{job.name[:24]} {job.progress:.0%}" for job in jobs
             )
+
+    def _add_subjobs(self: "MinimalManager", job: Job, priority: int) -> None:
+        while not job.sub_jobs.empty():
+            sub_job = job.sub_jobs.get()
+            if not self._seen_before(sub_job):
+                self._put(priority - 1, sub_job)
+
+
+class SubJobQueue(Queue):
+    """
+    Sub job queue of a running job.
+
+    Sub jobs put in the queue are passed straight to
+    :meth:`MinimalManager.put_sub_job`, so it is always empty.
+
+    :param manager: The manager running the job.
+    :param priority: The priority of the job.
+    :param resource: The pool the job is running in.
+    """
+
+    def __init__(
+        self: "SubJobQueue",
+        manager: MinimalManager,
+        priority: int,
+        resource: str = "network",
+    ) -> "SubJobQueue":
+        """Create the object."""
+        super().__init__()
+        self.manager = manager
+        self.priority = priority
+        self.resource = resource
+
+    def put(
+        self: "SubJobQueue",
+        item: Job,
+        block: bool = True,  # noqa: FBT001, FBT002
+        timeout: float | None = None,
+    ) -> None:
+        """Queue a sub job in the manager."""
+        self.manager.put_sub_job(
+            self.priority,
+            item,
+            timeout if block else 0,
+            self.resource,
+        )
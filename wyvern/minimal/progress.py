@@ -0,0 +1,71 @@
+"""
+Progress Sampling.
+
+Reads the progress counters of running jobs at a fixed rate.
+"""
+
+import time
+from collections.abc import Iterable
+
+from wyvern.abstract import Job
+
+
+def format_size(size: float) -> str:
+    """Format a number of bytes for display (eg ``1.5 MiB``)."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024:  # noqa: PLR2004
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+class ProgressSampler:
+    """
+    Sampler of the :attr:`~wyvern.abstract.Job.done` counters of jobs.
+
+    Each call to :meth:`sample` reads the counters of the running jobs once,
+    adding how far they have moved since the last sample to :attr:`total`.
+    :attr:`rate` is the throughput over the last :attr:`window` seconds.
+
+    If a job's counter goes backwards (eg yt-dlp moving on to the next file)
+    it is treated as starting again from zero.
+    """
+
+    window: float = 1.0
+    """Time (in seconds) the throughput is measured over."""
+
+    def __init__(self: "ProgressSampler") -> "ProgressSampler":
+        """Create the object."""
+        self.total = 0
+        """Work done by all sampled jobs."""
+
+        self.rate = 0.0
+        """Work done per second, over the last :attr:`window` seconds."""
+
+        self._last: dict[Job, int] = {}
+        self._window_start = time.monotonic()
+        self._window_total = 0
+
+    def sample(self: "ProgressSampler", jobs: Iterable[Job]) -> None:
+        """Read the counters of the running jobs."""
+        for job in jobs:
+            self._read(job)
+
+        now = time.monotonic()
+        if now - self._window_start >= self.window:
+            self.rate = (self.total - self._window_total) / (
+                now - self._window_start
+            )
+            self._window_start = now
+            self._window_total = self.total
+
+    def finish(self: "ProgressSampler", job: Job) -> None:
+        """Read a job's counter for the last time."""
+        self._read(job)
+        self._last.pop(job, None)
+
+    def _read(self: "ProgressSampler", job: Job) -> None:
+        done = job.done
+        last = self._last.get(job, 0)
+        self.total += done - last if done >= last else done
+        self._last[job] = done
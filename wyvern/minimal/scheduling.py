@@ -0,0 +1,217 @@
+"""
+Scheduling Policies.
+
+Decide the order jobs in a manager's queue are started in.
+"""
+
+import heapq
+from abc import ABC, abstractmethod
+from collections import Counter
+from collections.abc import Callable, Collection
+from queue import PriorityQueue
+
+from wyvern.abstract import Job
+
+Entry = tuple[int, int, Job]
+"""A queued job, as ``(priority, id, job)``."""
+
+
+class SchedulingPolicy(ABC):
+    """
+    Scheduling Policy Base Class.
+
+    Gives each queued job a key, and jobs with lower keys are started first.
+    Sub jobs have a priority one lower than the job which added them, so the
+    priority is how deep the job is (negated). The id is unique, and
+    increases in the order jobs are queued, so it breaks any ties.
+
+    Keys are made once, when the job is queued, under the queue's lock.
+
+    Policies can only order the jobs which are in the queue. A manager
+    holding back a Factory (eg with a ``queue_size``) only has that many of
+    its jobs queued at once, so the order of the rest of the Factory's jobs
+    is only changed within each window of them.
+    """
+
+    lookahead: int = 0
+    """
+    The number of jobs the policy needs queued to order them usefully.
+
+    Managers should let at least this many jobs wait, unless told otherwise.
+    """
+
+    @abstractmethod
+    def key(
+        self: "SchedulingPolicy",
+        priority: int,
+        job_id: int,
+        job: Job,
+    ) -> tuple:
+        """Make the key of a job."""
+
+
+class DepthFirst(SchedulingPolicy):
+    """
+    Start sub jobs before the jobs queued before them (the default).
+
+    Otherwise jobs are started in the order they were queued.
+    """
+
+    def key(self: "DepthFirst", priority: int, job_id: int, _: Job) -> tuple:
+        """Order by priority, then by when the job was queued."""
+        return (priority, job_id)
+
+
+class BreadthFirst(SchedulingPolicy):
+    """
+    Start every job before the sub jobs they add.
+
+    Useful to find all the work (eg every game's files) before starting it.
+    """
+
+    def key(self: "BreadthFirst", priority: int, job_id: int, _: Job) -> tuple:
+        """Order by depth, then by when the job was queued."""
+        return (-priority, job_id)
+
+
+class SmallestFirst(SchedulingPolicy):
+    """
+    Start the smallest jobs first (by :attr:`~wyvern.abstract.Job.size_hint`).
+
+    This finishes the most jobs in a limited time. Jobs without a size hint
+    are started after the ones with one.
+    """
+
+    lookahead = 1024
+
+    def key(
+        self: "SmallestFirst",
+        priority: int,
+        job_id: int,
+        job: Job,
+    ) -> tuple:
+        """Order by priority, then by size."""
+        size = job.size_hint
+        return (priority, size is None, size or 0, job_id)
+
+
+class LargestFirst(SchedulingPolicy):
+    """
+    Start the largest jobs first (by :attr:`~wyvern.abstract.Job.size_hint`).
+
+    The long downloads are started while there is plenty of other work to
+    keep the link busy, rather than being left running on their own at the
+    end. Jobs without a size hint are started last.
+    """
+
+    lookahead = 1024
+
+    def key(
+        self: "LargestFirst",
+        priority: int,
+        job_id: int,
+        job: Job,
+    ) -> tuple:
+        """Order by priority, then by size."""
+        return (priority, -(job.size_hint or 0), job_id)
+
+
+class RoundRobin(SchedulingPolicy):
+    """
+    Take turns between groups (by :attr:`~wyvern.abstract.Job.group_hint`).
+
+    The first job of every group is started, then the second of every group,
+    and so on, so no one group (eg an itch.io publisher) has all the workers.
+    """
+
+    lookahead = 1024
+
+    def __init__(self: "RoundRobin") -> "RoundRobin":
+        """Create the object."""
+        self._turns: Counter[tuple[int, str | None]] = Counter()
+
+    def key(self: "RoundRobin", priority: int, job_id: int, job: Job) -> tuple:
+        """Order by priority, then by the job's turn in its group."""
+        group = (priority, job.group_hint)
+        turn = self._turns[group]
+        self._turns[group] += 1
+        return (priority, turn, job_id)
+
+
+POLICIES: dict[str, type[SchedulingPolicy]] = {
+    "depth-first": DepthFirst,
+    "breadth-first": BreadthFirst,
+    "smallest-first": SmallestFirst,
+    "largest-first": LargestFirst,
+    "round-robin": RoundRobin,
+}
+"""Policies which can be selected by name."""
+
+
+class ScheduledQueue(PriorityQueue):
+    """
+    Queue of ``(priority, id, job)`` entries, in the order of a policy.
+
+    The entries are kept in a heap for each pool of workers (by
+    ``resource``), so the first job for the pools with free workers is found
+    without looking through the jobs for the busy ones.
+
+    :param policy: The policy ordering the jobs.
+    :param resource: Gets the pool a job runs in (by default, one pool).
+    """
+
+    def __init__(
+        self: "ScheduledQueue",
+        policy: SchedulingPolicy | None = None,
+        resource: Callable[[Job], str] | None = None,
+    ) -> "ScheduledQueue":
+        """Create the object."""
+        super().__init__()
+        self.policy = policy or DepthFirst()
+        self.resource = resource or (lambda _: "")
+
+    def get_first(
+        self: "ScheduledQueue",
+        resources: Collection[str] | None = None,
+    ) -> Entry | None:
+        """
+        Take the first entry for one of ``resources``, without waiting.
+
+        :param resources: The pools to take from (by default, every pool).
+        :returns: The entry, or None if there are none for those pools.
+        """
+        with self.not_empty:
+            entry = self._pop(resources)
+            if entry is not None:
+                self.not_full.notify()
+            return entry
+
+    def _pop(
+        self: "ScheduledQueue",
+        resources: Collection[str] | None = None,
+    ) -> Entry | None:
+        """Take the first entry for one of ``resources`` (with the lock)."""
+        heaps = [
+            heap
+            for resource, heap in self.heaps.items()
+            if heap and (resources is None or resource in resources)
+        ]
+        if not heaps:
+            return None
+        self.size -= 1
+        return heapq.heappop(min(heaps, key=lambda heap: heap[0]))[-1]
+
+    def _init(self: "ScheduledQueue", _: int) -> None:
+        self.heaps: dict[str, list] = {}
+        self.size = 0
+
+    def _qsize(self: "ScheduledQueue") -> int:
+        return self.size
+
+    def _put(self: "ScheduledQueue", entry: Entry) -> None:
+        heap = self.heaps.setdefault(self.resource(entry[2]), [])
+        heapq.heappush(heap, (*self.policy.key(*entry), entry))
+        self.size += 1
+
+    def _get(self: "ScheduledQueue") -> Entry:
+        return self._pop()
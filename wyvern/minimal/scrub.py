@@ -0,0 +1,235 @@
+"""
+Library Scrubbing.
+
+Check the files a plugin has downloaded against their recorded checksums,
+and download the bad ones again.
+"""
+
+import logging
+import mmap
+import os
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import as_completed
+from contextlib import suppress
+from hashlib import md5
+from pathlib import Path
+
+import coloredlogs
+from alive_progress import alive_bar
+
+from wyvern.abstract import Library, Manager
+from wyvern.data_store import SqliteDatabase
+from wyvern.minimal.main import DATA_STORES, load_plugin
+from wyvern.minimal.manager import MinimalManager, make_process_pool
+
+
+def hash_file(path: Path) -> str:
+    """Get the md5 of a file, reading it through a memory map."""
+    # Only used to spot corruption, so md5's weakness does not matter
+    checksum = md5()  # noqa: S324
+    with path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return checksum.hexdigest()  # Empty files cannot be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with suppress(AttributeError, OSError):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            checksum.update(mapped)
+    return checksum.hexdigest()
+
+
+class ScrubState:
+    """
+    Record of the files which passed a scrub.
+
+    Each file is recorded with its size and modification time when it was
+    hashed, so it is only hashed again once it has changed. The records are
+    stored in ``<plugin_id>/.scrub.sqlite3``.
+
+    :param path: The database file.
+    """
+
+    def __init__(self: "ScrubState", path: Path) -> "ScrubState":
+        """Open (or create) the database."""
+        self._db = SqliteDatabase(
+            path,
+            [
+                (
+                    "CREATE TABLE IF NOT EXISTS files ("
+                    " path TEXT PRIMARY KEY,"
+                    " size INTEGER,"
+                    " mtime_ns INTEGER,"
+                    " md5_hash TEXT"
+                    ")"
+                ),
+            ],
+        )
+
+    def unchanged(
+        self: "ScrubState",
+        path: Path,
+        stat: os.stat_result,
+        md5_hash: str,
+    ) -> bool:
+        """Check if a file passed, and has not changed since."""
+        rows = self._db.execute(
+            "SELECT size, mtime_ns, md5_hash FROM files WHERE path = ?",
+            (str(path),),
+        )
+        return rows == [(stat.st_size, stat.st_mtime_ns, md5_hash)]
+
+    def passed(
+        self: "ScrubState",
+        path: Path,
+        stat: os.stat_result,
+        md5_hash: str,
+    ) -> None:
+        """Record a file passing."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, md5_hash)"
+            " VALUES (?, ?, ?, ?)",
+            (str(path), stat.st_size, stat.st_mtime_ns, md5_hash),
+        )
+
+    def failed(self: "ScrubState", path: Path) -> None:
+        """Remove the record of a file, so it is always checked again."""
+        self._db.execute("DELETE FROM files WHERE path = ?", (str(path),))
+
+
+def scrub(
+    library: Library,
+    manager: Manager,
+    processes: int | None = None,
+    *,
+    full: bool = False,
+) -> list[tuple[str, Path, str]]:
+    """
+    Check every file downloaded by a plugin.
+
+    Files are first checked against their recorded size, and then hashed in
+    a pool of ``processes`` processes (by default, one per CPU). Files which
+    passed a previous scrub are skipped if their size and modification time
+    are the same, unless ``full`` is set.
+
+    :returns: ``(file_id, path, problem)`` for every missing or bad file.
+    """
+    state = ScrubState(Path(manager.plugin_id) / ".scrub.sqlite3")
+    problems = []
+    to_hash = []
+    skipped = 0
+    for file_id, path, size, md5_hash in library.downloaded_files(manager):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            problems.append((file_id, path, "missing"))
+            continue
+        if size is not None and stat.st_size != size:
+            state.failed(path)
+            problems.append(
+                (file_id, path, f"{stat.st_size} bytes, expected {size}"),
+            )
+        elif not md5_hash:
+            continue
+        elif not full and state.unchanged(path, stat, md5_hash):
+            skipped += 1
+        else:
+            to_hash.append((file_id, path, stat, md5_hash))
+
+    logging.info(
+        "Hashing %d files, skipping %d unchanged since the last scrub.",
+        len(to_hash),
+        skipped,
+    )
+    # Start the largest first, so one is not left running on its own
+    to_hash.sort(key=lambda file: file[2].st_size, reverse=True)
+    with make_process_pool(processes) as executor, alive_bar(
+        len(to_hash),
+        title="Scrubbing",
+    ) as bar:
+        futures = {
+            executor.submit(hash_file, file[1]): file for file in to_hash
+        }
+        for future in as_completed(futures):
+            file_id, path, stat, md5_hash = futures[future]
+            bar()
+            try:
+                digest = future.result()
+            except OSError as e:
+                state.failed(path)
+                problems.append((file_id, path, f"unreadable ({e})"))
+                continue
+            if digest == md5_hash:
+                state.passed(path, stat, md5_hash)
+            else:
+                state.failed(path)
+                problems.append(
+                    (file_id, path, f"md5 {digest}, expected {md5_hash}"),
+                )
+
+    return problems
+
+
+def make_parser(parser: ArgumentParser) -> None:
+    """Create The Parser."""
+    parser.add_argument(
+        "library",
+        type=str,
+        help="The Library class listing the plugin's files",
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        help="The number of files to hash at the same time (defaults to one "
+        "per CPU)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Hash every file, even those unchanged since the last scrub",
+    )
+    parser.add_argument(
+        "--requeue",
+        action="store_true",
+        help="Download missing and bad files again",
+    )
+    parser.add_argument(
+        "--data-store",
+        choices=DATA_STORES,
+        default="yaml",
+        help="How to store the configuration and secrets (default: yaml)",
+    )
+
+
+def run_main(args: Namespace) -> None:
+    """
+    Run the main function.
+
+    :param args: The Parsed Arguments
+    """
+    coloredlogs.install(
+        level="INFO",
+        fmt="[%(asctime)s] %(levelname)s - %(message)s",
+    )
+
+    library = load_plugin(args.library)
+    if library is None:
+        return
+    if not isinstance(library, Library):
+        logging.error("%s is not a Library", args.library)
+        return
+
+    manager = MinimalManager(library.plugin_id, DATA_STORES[args.data_store])
+    problems = scrub(library, manager, args.processes, full=args.full)
+    for _, path, problem in problems:
+        logging.warning("%s: %s", path, problem)
+    logging.info("Scrub found %d missing or bad files.", len(problems))
+
+    if args.requeue and problems:
+        file_ids = [file_id for file_id, _, _ in problems]
+
+        def load_jobs(manager: Manager) -> None:
+            for job in library.redownload_jobs(manager, file_ids):
+                manager.add_job(job)
+
+        manager.produce(load_jobs)
+        manager.do_jobs()
@@ -0,0 +1,25 @@
+"""
+Wyvern Networking Classes.
+
+Shared HTTP helpers for managers and plugins.
+"""
+
+from .async_session import AsyncSession
+from .bandwidth import Bandwidth, parse_rate
+from .cache import HttpCache
+from .download import ChecksumError, Download, SegmentedDownload
+from .limits import HostLimit, HostLimits
+from .session import make_session
+
+__all__ = [
+    "AsyncSession",
+    "Bandwidth",
+    "ChecksumError",
+    "Download",
+    "HostLimit",
+    "HostLimits",
+    "HttpCache",
+    "SegmentedDownload",
+    "make_session",
+    "parse_rate",
+]
@@ -0,0 +1,211 @@
+"""
+Async HTTP Session.
+
+Makes requests on an event loop, keeping to the host limits, statistics and
+cache of a session made by :func:`~wyvern.network.session.make_session`.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from requests import PreparedRequest, Request, Response, Session, codes
+from requests import exceptions as request_exceptions
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .cache import cached_response, validators
+from .limits import (
+    THROTTLE_STATUSES,
+    HostLimits,
+    RequestStats,
+    parse_retry_after,
+)
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is an optional dependency
+    aiohttp = None
+
+
+class AsyncSession:
+    """
+    Session making requests with :mod:`aiohttp`.
+
+    Requests are built by the synchronous ``session`` (so they get its
+    headers, cookies and authentication), and share its
+    :class:`~wyvern.network.limits.LimitedAdapter`'s limits and statistics,
+    and its :class:`~wyvern.network.cache.HttpCache`. So jobs run as tasks are
+    held to the same per-host limits as jobs run in threads, and are seen by
+    the adaptive concurrency controller.
+
+    As with :meth:`~wyvern.network.limits.LimitedAdapter.send`, throttled
+    requests are retried up to ``throttle_retries`` times, once the host is
+    ready for them. Other failures are not retried.
+
+    Responses are returned as :class:`requests.Response`, with their body
+    already read, and errors are raised as :mod:`requests.exceptions`, so
+    jobs can handle them the same way whichever session they used.
+
+    :param session: The session to share the limits, statistics and cache of.
+    :param connections: The number of connections to keep open.
+    """
+
+    def __init__(
+        self: "AsyncSession",
+        session: Session,
+        connections: int = 100,
+    ) -> "AsyncSession":
+        """Create the object (on the event loop which will use it)."""
+        if aiohttp is None:
+            msg = "aiohttp is needed for async requests"
+            raise ImportError(msg)
+
+        adapter = session.get_adapter("https://")
+        self.session = session
+        self.limits: HostLimits = getattr(adapter, "limits", HostLimits())
+        self.stats: RequestStats = getattr(adapter, "stats", RequestStats())
+        self.throttle_retries: int = getattr(adapter, "throttle_retries", 5)
+        self.cache = getattr(session, "cache", None)
+
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=connections),
+        )
+
+    async def close(self: "AsyncSession") -> None:
+        """Close the connections."""
+        await self._session.close()
+
+    async def get(
+        self: "AsyncSession",
+        url: str,
+        **kwargs: object,
+    ) -> Response:
+        """Make a ``GET`` request (see :meth:`request`)."""
+        return await self.request("GET", url, **kwargs)
+
+    async def post(
+        self: "AsyncSession",
+        url: str,
+        **kwargs: object,
+    ) -> Response:
+        """Make a ``POST`` request (see :meth:`request`)."""
+        return await self.request("POST", url, **kwargs)
+
+    async def request(  # noqa: PLR0913
+        self: "AsyncSession",
+        method: str,
+        url: str,
+        *,
+        params: dict | None = None,
+        headers: dict | None = None,
+        data: object = None,
+        timeout: float | None = 10,  # noqa: ASYNC109 - as in requests
+    ) -> Response:
+        """
+        Make a request, revalidating a stored response if there is one.
+
+        :param method: The HTTP method.
+        :param url: The URL to request.
+        :param params: The query string parameters.
+        :param headers: The request's headers.
+        :param data: The request's body.
+        :param timeout: The seconds to wait for the whole response.
+        :raises requests.exceptions.Timeout: If the request timed out.
+        :raises requests.exceptions.ConnectionError: If the request failed.
+        """
+        request = self.session.prepare_request(
+            Request(method, url, params=params, headers=headers, data=data),
+        )
+        # aiohttp only decodes the encodings it has support for
+        request.headers.pop("Accept-Encoding", None)
+
+        if (
+            self.cache is None
+            or request.method != "GET"
+            or "If-None-Match" in request.headers
+            or "If-Modified-Since" in request.headers
+        ):
+            return await self._send(request, timeout)
+
+        key = self.cache.key(request)
+        stored = await asyncio.to_thread(self.cache.get, key)
+        if stored is not None:
+            request.headers.update(validators(stored[0]))
+
+        rsp = await self._send(request, timeout)
+        if rsp.status_code == codes.not_modified and stored is not None:
+            return cached_response(rsp, *stored)
+        if rsp.status_code == codes.ok:
+            await asyncio.to_thread(self.cache.put, key, rsp)
+        return rsp
+
+    async def _send(
+        self: "AsyncSession",
+        request: PreparedRequest,
+        timeout: float | None,  # noqa: ASYNC109
+    ) -> Response:
+        """Send a request once its host is ready for it."""
+        host = urlsplit(request.url).hostname or ""
+        limit = self.limits[host]
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        for attempt in range(self.throttle_retries + 1):
+            await limit.acquire_async()
+            start = time.monotonic()
+            try:
+                async with self._session.request(
+                    request.method,
+                    request.url,
+                    headers=dict(request.headers),
+                    data=request.body,
+                    timeout=client_timeout,
+                ) as rsp:
+                    body = await rsp.read()
+            except TimeoutError as exc:
+                self.stats.record(time.monotonic() - start, failed=True)
+                raise request_exceptions.Timeout(exc, request=request) from exc
+            except aiohttp.ClientError as exc:
+                self.stats.record(time.monotonic() - start, failed=True)
+                raise request_exceptions.ConnectionError(
+                    exc,
+                    request=request,
+                ) from exc
+            finally:
+                limit.release()
+
+            elapsed = time.monotonic() - start
+            throttled = rsp.status in THROTTLE_STATUSES
+            self.stats.record(elapsed, throttled=throttled)
+            if not throttled:
+                limit.succeeded()
+                break
+            limit.throttled(parse_retry_after(rsp.headers.get("Retry-After")))
+            if attempt < self.throttle_retries:
+                logging.info("%s throttled %s", request.url, rsp.status)
+
+        return _to_response(rsp, body, request, elapsed)
+
+
+def _to_response(
+    rsp: "aiohttp.ClientResponse",
+    body: bytes,
+    request: PreparedRequest,
+    elapsed: float,
+) -> Response:
+    """Convert an :mod:`aiohttp` response to a :class:`requests.Response`."""
+    response = Response()
+    response.status_code = rsp.status
+    response.reason = rsp.reason
+    response.headers = CaseInsensitiveDict()
+    for name, value in rsp.headers.items():  # Join repeated headers as urllib3
+        if name in response.headers:
+            value = f"{response.headers[name]}, {value}"  # noqa: PLW2901
+        response.headers[name] = value
+    response._content = body  # noqa: SLF001
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = str(rsp.url)
+    response.request = request
+    response.elapsed = timedelta(seconds=elapsed)
+    return response
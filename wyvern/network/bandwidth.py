@@ -0,0 +1,90 @@
+"""
+Bandwidth Limits.
+
+Caps the bytes per second downloaded by all downloads together.
+"""
+
+import re
+import time
+from threading import Lock
+
+UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+"""Multipliers of the suffixes accepted by :func:`parse_rate`."""
+
+rate_regex = re.compile(r"([\d.]+)\s*([KMG]?)(?:i?B)?(?:/s)?", re.IGNORECASE)
+
+
+def parse_rate(value: str | float | None) -> float | None:
+    """
+    Parse a rate in bytes per second (eg ``500K``, ``1.5M`` or ``2000``).
+
+    :returns: The rate, or None for no limit (if the value is empty or 0).
+    :raises ValueError: If the rate cannot be parsed.
+    """
+    if isinstance(value, int | float):
+        return float(value) or None
+    if not value:
+        return None
+    match = rate_regex.fullmatch(value.strip())
+    if match is None:
+        msg = f"Invalid rate: {value}"
+        raise ValueError(msg)
+    number, unit = match.groups()
+    return float(number) * UNITS[unit.upper()] or None
+
+
+class Bandwidth:
+    """
+    Cap on the bytes per second downloaded.
+
+    The cap is a token bucket for the whole run, drawn on by every download
+    with :meth:`throttle` as it receives data. Downloads which are busy get
+    the share of those which are not (eg which are waiting for a response,
+    hashing or post-processing), so the downloads together run as fast as
+    the cap allows. Leaving the bucket unused only earns :attr:`burst`
+    seconds of catching up.
+
+    The rate can be changed at any time by setting :attr:`rate`, and is used
+    from the next chunk. A limit with a ``parent`` (eg a plugin's limit
+    within the limit of the whole run) also draws on the parent.
+
+    :param rate: The bytes per second, or None for no limit.
+    :param parent: The limit this is part of.
+    """
+
+    burst: float = 0.25
+    """Time (in seconds) of unused bandwidth which can be caught up on."""
+
+    def __init__(
+        self: "Bandwidth",
+        rate: float | None = None,
+        parent: "Bandwidth | None" = None,
+    ) -> "Bandwidth":
+        """Create the object."""
+        self.rate = rate
+        self.parent = parent
+        self._next = time.monotonic()
+        self._lock = Lock()
+
+    def throttle(self: "Bandwidth", size: int) -> None:
+        """Wait until ``size`` more received bytes are within the limit."""
+        delay = self._reserve(size)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _reserve(self: "Bandwidth", size: int) -> float:
+        """
+        Draw ``size`` bytes from the bucket, and its parents.
+
+        :returns: How long to wait for the bytes to be within the limits.
+        """
+        delay = 0.0
+        rate = self.rate
+        if rate:
+            with self._lock:
+                now = time.monotonic()
+                self._next = max(self._next, now - self.burst) + size / rate
+                delay = self._next - now
+        if self.parent is not None:
+            delay = max(delay, self.parent._reserve(size))  # noqa: SLF001
+        return delay
@@ -0,0 +1,255 @@
+"""
+HTTP Cache.
+
+Keeps responses on disk, and revalidates them with conditional requests so
+unchanged content is not downloaded again.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from hashlib import sha256
+from pathlib import Path
+
+from requests import PreparedRequest, Response, Session, codes
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from wyvern.data_store import SqliteDatabase
+
+NOT_UPDATED = frozenset(
+    {
+        "connection",
+        "content-encoding",
+        "content-length",
+        "content-range",
+        "keep-alive",
+        "trailer",
+        "transfer-encoding",
+        "upgrade",
+    },
+)
+"""
+Headers of a ``304 Not Modified`` response not copied to the stored response.
+
+These describe the 304 message itself (RFC 9111 section 3.2), or the
+encoding of a body which is stored already decoded.
+"""
+
+
+class HttpCache:
+    """
+    On-disk cache of HTTP responses.
+
+    Successful responses with an ``ETag`` or ``Last-Modified`` header are
+    stored in a SQLite database. Later requests for the same URL (and
+    ``Authorization``) send them back as ``If-None-Match`` and
+    ``If-Modified-Since``, and a ``304 Not Modified`` response is answered
+    with the stored body.
+
+    The stored bodies are kept under ``max_size`` bytes by removing the least
+    recently used responses. Responses larger than a tenth of that, or marked
+    ``Cache-Control: no-store``, are not stored.
+
+    If the database cannot be used (eg it is locked by another process),
+    requests are made as if nothing was stored.
+
+    :param path: The database file.
+    :param max_size: The most bytes of responses to keep.
+    """
+
+    def __init__(
+        self: "HttpCache",
+        path: Path,
+        max_size: int = 64 << 20,
+    ) -> "HttpCache":
+        """Open (or create) the cache."""
+        self.max_size = max_size
+        self._db = SqliteDatabase(
+            path,
+            [
+                (
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    " key TEXT PRIMARY KEY,"
+                    " headers TEXT NOT NULL,"
+                    " body BLOB NOT NULL,"
+                    " size INTEGER NOT NULL,"
+                    " used REAL NOT NULL"
+                    ")"
+                ),
+                (
+                    "CREATE INDEX IF NOT EXISTS responses_used"
+                    " ON responses (used)"
+                ),
+            ],
+        )
+        [(size,)] = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses",
+        )
+        self.size = size
+        """Bytes of responses stored."""
+
+    @staticmethod
+    def key(request: PreparedRequest) -> str:
+        """Get the key of the response to a request."""
+        auth = request.headers.get("Authorization") or ""
+        return f"{request.url} {sha256(auth.encode()).hexdigest()[:16]}"
+
+    def get(
+        self: "HttpCache",
+        key: str,
+    ) -> tuple[CaseInsensitiveDict, bytes] | None:
+        """Get the headers and body of a stored response."""
+        try:
+            with self._db.transaction() as db:
+                row = db.execute(
+                    "SELECT headers, body FROM responses WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    return None
+                db.execute(
+                    "UPDATE responses SET used = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+        except sqlite3.Error:
+            logging.warning("Cannot read the HTTP cache", exc_info=True)
+            return None
+        headers, body = row
+        return CaseInsensitiveDict(json.loads(headers)), body
+
+    def put(self: "HttpCache", key: str, rsp: Response) -> None:
+        """Store a response, if it can be revalidated."""
+        if not (rsp.headers.get("ETag") or rsp.headers.get("Last-Modified")):
+            return
+        if "no-store" in rsp.headers.get("Cache-Control", ""):
+            return
+        body = rsp.content
+        if len(body) > self.max_size // 10:
+            return
+
+        headers = json.dumps(dict(rsp.headers))
+        try:
+            with self._db.transaction(immediate=True) as db:
+                old = db.execute(
+                    "SELECT size FROM responses WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                db.execute(
+                    "INSERT OR REPLACE INTO responses"
+                    " (key, headers, body, size, used) VALUES (?, ?, ?, ?, ?)",
+                    (key, headers, body, len(body), time.time()),
+                )
+                self.size += len(body) - (old[0] if old else 0)
+                self._evict(db)
+        except sqlite3.Error:
+            logging.warning("Cannot write the HTTP cache", exc_info=True)
+
+    def _evict(self: "HttpCache", db: sqlite3.Connection) -> None:
+        """
+        Remove the least recently used responses (in a transaction).
+
+        The size is counted again before removing any, as other processes
+        sharing the cache may have changed it.
+        """
+        if self.size <= self.max_size:
+            return
+        (self.size,) = db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses",
+        ).fetchone()
+        while self.size > self.max_size:
+            row = db.execute(
+                "SELECT key, size FROM responses ORDER BY used LIMIT 1",
+            ).fetchone()
+            if row is None:
+                self.size = 0
+                return
+            key, size = row
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.size -= size
+
+
+class CachingSession(Session):
+    """
+    Session answering unchanged ``GET`` requests from an :class:`HttpCache`.
+
+    Only requests which are not streamed, and do not make their own
+    conditional request, use the cache. Responses answered from the cache
+    have a ``from_cache`` attribute set to True.
+
+    :param cache: The cache to use.
+    """
+
+    def __init__(self: "CachingSession", cache: HttpCache) -> "CachingSession":
+        """Create the object."""
+        super().__init__()
+        self.cache = cache
+
+    def send(
+        self: "CachingSession",
+        request: PreparedRequest,
+        **kwargs: object,
+    ) -> Response:
+        """Send a request, revalidating a stored response if there is one."""
+        if (
+            request.method != "GET"
+            or kwargs.get("stream")
+            or "If-None-Match" in request.headers
+            or "If-Modified-Since" in request.headers
+        ):
+            return super().send(request, **kwargs)
+
+        key = self.cache.key(request)
+        stored = self.cache.get(key)
+        if stored is not None:
+            request.headers.update(validators(stored[0]))
+
+        rsp = super().send(request, **kwargs)
+        if rsp.status_code == codes.not_modified and stored is not None:
+            return cached_response(rsp, *stored)
+        if rsp.status_code == codes.ok:
+            self.cache.put(key, rsp)
+        return rsp
+
+
+def validators(headers: CaseInsensitiveDict) -> dict[str, str]:
+    """Get the headers revalidating a stored response with these headers."""
+    conditions = {}
+    if "ETag" in headers:
+        conditions["If-None-Match"] = headers["ETag"]
+    if "Last-Modified" in headers:
+        conditions["If-Modified-Since"] = headers["Last-Modified"]
+    return conditions
+
+
+def cached_response(
+    rsp: Response,
+    headers: CaseInsensitiveDict,
+    body: bytes,
+) -> Response:
+    """
+    Make the response to a request from the stored response.
+
+    :param rsp: The ``304 Not Modified`` response to the request.
+    :param headers: The stored headers.
+    :param body: The stored body.
+    """
+    headers.update(
+        (name, value)
+        for name, value in rsp.headers.items()
+        if name.lower() not in NOT_UPDATED
+    )
+    cached = Response()
+    cached.status_code = codes.ok
+    cached.reason = "OK"
+    cached.headers = headers
+    cached._content = body  # noqa: SLF001
+    cached.encoding = get_encoding_from_headers(headers)
+    cached.url = rsp.url
+    cached.request = rsp.request
+    cached.history = rsp.history
+    cached.elapsed = rsp.elapsed
+    cached.connection = getattr(rsp, "connection", None)
+    cached.from_cache = True
+    return cached
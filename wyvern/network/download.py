@@ -0,0 +1,640 @@
+"""
+Resumable Downloads.
+
+Download files through a manager's session, resuming interrupted downloads
+with HTTP ``Range`` requests.
+"""
+
+import logging
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from hashlib import md5
+from pathlib import Path
+from queue import SimpleQueue
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, BinaryIO, Self
+
+import requests
+import yaml
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import (
+    DecodeError,
+    ProtocolError,
+    ReadTimeoutError,
+    SSLError,
+)
+
+from .bandwidth import Bandwidth
+
+if TYPE_CHECKING:
+    from hashlib import _Hash
+
+
+class ChecksumError(Exception):
+    """The downloaded file does not match the expected checksum."""
+
+
+class Download:
+    """
+    Resumable download of a single file.
+
+    The data is written to ``part_file``, with a small YAML sidecar next to it
+    (``part_file`` + ``.yaml``) recording what the partial data belongs to. If
+    the download is interrupted (by a network error or the program stopping),
+    fetching it again continues from the end of the partial data with a
+    ``Range`` request. The bytes already on disk are hashed again before
+    resuming, so the md5 of the whole file is still checked.
+
+    If the sidecar does not match the download (eg the file was updated), or
+    the server does not honour the range, the download starts from scratch.
+
+    The response is read straight into a ring of :attr:`buffers` buffers of
+    ``buffer_size`` bytes, which are written to disk and then hashed on a
+    thread of their own, so hashing overlaps with receiving the next buffer.
+    If the size is known the file is preallocated, and the sidecar records
+    how much of it has been written every :attr:`save_interval` bytes.
+
+    :param session: The session to download with.
+    :param url: The URL of the file.
+    :param part_file: Where to write the partial data.
+    :param params: URL parameters for the request.
+    :param size: The expected size of the file in bytes (if known).
+    :param md5_hash: The expected md5 of the file (if known).
+    :param bandwidth: The bandwidth limit to keep to (if any).
+    :param buffer_size: The bytes read from the response at a time (defaults
+        to :attr:`buffer_size`).
+    """
+
+    buffer_size: int = 1 << 20
+    """Size of the buffers the response is read into."""
+
+    buffers: int = 4
+    """Number of buffers which can be waiting to be hashed."""
+
+    save_interval: int = 4 << 20
+    """Bytes downloaded between saving the sidecar."""
+
+    retries: int = 3
+    """Number of times to resume after a network error before giving up."""
+
+    def __init__(  # noqa: PLR0913
+        self: "Download",
+        session: requests.Session,
+        url: str,
+        part_file: Path,
+        *,
+        params: dict | None = None,
+        size: int | None = None,
+        md5_hash: str | None = None,
+        bandwidth: Bandwidth | None = None,
+        buffer_size: int | None = None,
+    ) -> "Download":
+        """Create the object."""
+        self.session = session
+        self.url = url
+        self.params = params
+        self.part_file = part_file
+        self.sidecar = part_file.with_name(part_file.name + ".yaml")
+        self.size = size
+        self.md5_hash = md5_hash
+        self.bandwidth = bandwidth
+        if buffer_size:
+            self.buffer_size = buffer_size
+
+        self.downloaded = 0
+        """Bytes of the file on disk."""
+
+        self.headers: dict = {}
+        """
+        Headers of the last response (or its ``Content-Disposition``, kept in
+        the sidecar, if the file had already been downloaded).
+        """
+
+    def fetch(
+        self: "Download",
+        progress: Callable[[int], None] | None = None,
+    ) -> Path:
+        """
+        Download the file.
+
+        :param progress: Called with the number of bytes on disk as the
+            download progresses.
+        :raises ChecksumError: If the finished file does not match ``md5_hash``
+            (the partial data is removed).
+        :raises requests.exceptions.RequestException: If the download still
+            fails after :attr:`retries` attempts (the partial data is kept, to
+            be resumed later).
+        :returns: The path to the completed file (:attr:`part_file`).
+        """
+        self.part_file.parent.mkdir(parents=True, exist_ok=True)
+        for attempt in range(self.retries + 1):
+            try:
+                checksum = self._stream(progress)
+                break
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+            ):
+                if attempt == self.retries:
+                    raise
+                logging.warning(
+                    "Download of %s interrupted at %d bytes, resuming.",
+                    self.url,
+                    self.downloaded,
+                )
+
+        return self._verify(checksum)
+
+    def _throttle(self: "Download", size: int) -> None:
+        """Wait for ``size`` received bytes to be within the bandwidth."""
+        if self.bandwidth is not None:
+            self.bandwidth.throttle(size)
+
+    def _verify(self: "Download", checksum: "_Hash") -> Path:
+        """Check the md5 of the finished file and remove the sidecar."""
+        if self.md5_hash and checksum.hexdigest() != self.md5_hash:
+            self.discard()
+            msg = (
+                f"Checksum failed for {self.url}. Got: {checksum.hexdigest()},"
+                f" expected {self.md5_hash}"
+            )
+            raise ChecksumError(msg)
+
+        self.sidecar.unlink(missing_ok=True)
+        return self.part_file
+
+    def discard(self: "Download") -> None:
+        """Remove the partial data and its sidecar."""
+        self.part_file.unlink(missing_ok=True)
+        self.sidecar.unlink(missing_ok=True)
+        self.downloaded = 0
+
+    def _stream(
+        self: "Download",
+        progress: Callable[[int], None] | None,
+    ) -> "_Hash":
+        """Stream the (rest of the) file to disk, returning the md5."""
+        sidecar = self._load_sidecar()
+        offset = 0
+        if sidecar is not None:
+            # The file may be preallocated beyond what was written
+            offset = self.part_file.stat().st_size
+            offset = min(sidecar.get("downloaded", offset), offset)
+
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            # Only strong ETags can be used to validate a range
+            validator = sidecar.get("etag") or ""
+            if validator.startswith("W/"):
+                validator = ""
+            validator = validator or sidecar.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+
+        # Closing the response releases the connection (and host slot)
+        with self.session.get(
+            self.url,
+            params=self.params,
+            headers=headers,
+            stream=True,
+            timeout=10,
+        ) as rsp:
+            return self._receive(rsp, offset, progress)
+
+    def _receive(
+        self: "Download",
+        rsp: requests.Response,
+        offset: int,
+        progress: Callable[[int], None] | None,
+    ) -> "_Hash":
+        """Save a response to the part file, returning the md5."""
+        # Checked against the caller's md5_hash, to spot corruption
+        checksum = md5()  # noqa: S324
+
+        if offset and rsp.status_code == requests.codes.range_not_satisfiable:
+            # Everything was downloaded before, but not verified
+            with self.part_file.open("rb") as f:
+                self._hash_existing(f, offset, checksum)
+            self.downloaded = offset
+            sidecar = self._load_sidecar() or {}
+            disposition = sidecar.get("content_disposition")
+            self.headers = CaseInsensitiveDict(
+                {"Content-Disposition": disposition} if disposition else {},
+            )
+            return checksum
+
+        rsp.raise_for_status()
+        self.headers = rsp.headers
+
+        if offset and rsp.status_code != requests.codes.partial_content:
+            logging.info("Server ignored range for %s, restarting.", self.url)
+            offset = 0
+        self.downloaded = offset
+        self._write_sidecar(rsp)
+
+        with self.part_file.open("r+b" if offset else "wb") as f:
+            self._hash_existing(f, offset, checksum)
+            f.seek(offset)
+            f.truncate()
+            if self.size and self.size > offset:
+                with suppress(AttributeError, OSError):
+                    os.posix_fallocate(f.fileno(), offset, self.size - offset)
+
+            self._write_response(f, rsp, checksum, progress)
+
+            # Drop any preallocated space the file did not fill
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+        return checksum
+
+    def _write_response(
+        self: "Download",
+        f: BinaryIO,
+        rsp: requests.Response,
+        checksum: "_Hash",
+        progress: Callable[[int], None] | None,
+    ) -> None:
+        """Write the response to ``f``, hashing it as it is written."""
+        unsaved = 0
+        with HashPipeline(checksum, self.buffer_size, self.buffers) as hashing:
+            try:
+                while True:
+                    buffer = hashing.take()
+                    size = read_into(rsp, buffer)
+                    if not size:
+                        hashing.give_back(buffer)
+                        return
+                    f.write(buffer[:size])
+                    hashing.hash(buffer, size)
+
+                    self.downloaded += size
+                    unsaved += size
+                    if unsaved >= self.save_interval:
+                        # Never claim data still in a buffer
+                        f.flush()
+                        self._write_sidecar(rsp)
+                        unsaved = 0
+                    self._throttle(size)
+                    if progress is not None:
+                        progress(self.downloaded)
+            finally:
+                # Resume from exactly here if the download was interrupted
+                f.flush()
+                self._write_sidecar(rsp)
+
+    def _hash_existing(
+        self: "Download",
+        f: BinaryIO,
+        offset: int,
+        checksum: "_Hash",
+    ) -> None:
+        """Add the first ``offset`` bytes of ``f`` to the checksum."""
+        f.seek(0)
+        remaining = offset
+        while remaining > 0:
+            chunk = f.read(min(remaining, self.buffer_size))
+            if not chunk:
+                break
+            checksum.update(chunk)
+            remaining -= len(chunk)
+
+    def _load_sidecar(self: "Download") -> dict | None:
+        """Load the sidecar, if it belongs to this (single stream) download."""
+        data = self._read_sidecar()
+        if data is None or "segments" in data:
+            return None
+        return data
+
+    def _read_sidecar(self: "Download") -> dict | None:
+        """Read the sidecar, if it belongs to this file."""
+        if not self.part_file.exists():
+            return None
+        data = None
+        with suppress(FileNotFoundError, yaml.YAMLError), self.sidecar.open(
+            "r",
+        ) as f:
+            data = yaml.safe_load(f)
+        if not isinstance(data, dict):
+            return None
+        if (data.get("url"), data.get("size"), data.get("md5_hash")) != (
+            self.url,
+            self.size,
+            self.md5_hash,
+        ):
+            return None
+        return data
+
+    def _write_sidecar(self: "Download", rsp: requests.Response) -> None:
+        """Record what the partial data belongs to."""
+        with self.sidecar.open("w") as f:
+            yaml.safe_dump(
+                {
+                    "url": self.url,
+                    "size": self.size,
+                    "md5_hash": self.md5_hash,
+                    "etag": rsp.headers.get("ETag"),
+                    "last_modified": rsp.headers.get("Last-Modified"),
+                    # Names the file, if the response is not needed again
+                    "content_disposition": rsp.headers.get(
+                        "Content-Disposition",
+                    ),
+                    "downloaded": self.downloaded,
+                },
+                f,
+            )
+
+
+class SegmentedDownload(Download):
+    """
+    Download a large file as several concurrent byte ranges.
+
+    The file is preallocated to its full ``size`` and split into ``segments``
+    ranges, which are each downloaded by their own thread into their place in
+    the file. Once every range is finished the md5 of the whole file is
+    checked.
+
+    The sidecar records how far each range has got, so an interrupted download
+    resumes every range where it left off. If the server does not accept
+    ranges, this falls back to a single stream :class:`Download`.
+
+    :param size: The size of the file in bytes (required).
+    :param segments: The number of ranges to download at the same time.
+    """
+
+    min_segment_size: int = 1 << 20
+    """Smallest range worth downloading on its own connection."""
+
+    def __init__(
+        self: "SegmentedDownload",
+        session: requests.Session,
+        url: str,
+        part_file: Path,
+        *,
+        size: int,
+        segments: int = 4,
+        **kwargs: dict,
+    ) -> "SegmentedDownload":
+        """Create the object."""
+        super().__init__(session, url, part_file, size=size, **kwargs)
+        self.segments = segments
+        self._ranges: list[list[int]] = []
+        self._lock = Lock()
+        self._unsaved = 0
+
+    def fetch(
+        self: "SegmentedDownload",
+        progress: Callable[[int], None] | None = None,
+    ) -> Path:
+        """
+        Download the file.
+
+        Raises the same exceptions as :meth:`Download.fetch`.
+        """
+        self.part_file.parent.mkdir(parents=True, exist_ok=True)
+        if not self._accepts_ranges():
+            logging.info(
+                "%s does not accept ranges, using a single stream.",
+                self.url,
+            )
+            return super().fetch(progress)
+
+        sidecar = self._read_sidecar()
+        if sidecar is not None and "segments" in sidecar:
+            self._ranges = sidecar["segments"]
+        else:
+            self._allocate()
+        self.downloaded = sum(done for _, _, done in self._ranges)
+
+        with ThreadPoolExecutor(max_workers=len(self._ranges)) as executor:
+            futures = [
+                executor.submit(self._fetch_range, segment, progress)
+                for segment in self._ranges
+            ]
+        with self._lock:
+            self._save()
+        for future in futures:
+            if future.exception() is not None:
+                raise future.exception()
+
+        # Checked against the caller's md5_hash, to spot corruption
+        checksum = md5()  # noqa: S324
+        with self.part_file.open("rb") as f:
+            self._hash_existing(f, self.size, checksum)
+        return self._verify(checksum)
+
+    def _accepts_ranges(self: "SegmentedDownload") -> bool:
+        """Check the server will send part of the file."""
+        with self.session.get(
+            self.url,
+            params=self.params,
+            headers={"Range": "bytes=0-0"},
+            stream=True,
+            timeout=10,
+        ) as rsp:
+            rsp.raise_for_status()
+            self.headers = rsp.headers
+            return rsp.status_code == requests.codes.partial_content
+
+    def _allocate(self: "SegmentedDownload") -> None:
+        """Create the full size file and split it into ranges."""
+        with self.part_file.open("wb") as f:
+            f.truncate(self.size)
+            with suppress(AttributeError, OSError):
+                os.posix_fallocate(f.fileno(), 0, self.size)
+
+        count = max(min(self.segments, self.size // self.min_segment_size), 1)
+        step = -(-self.size // count)
+        self._ranges = [
+            [start, min(start + step, self.size) - 1, 0]
+            for start in range(0, self.size, step)
+        ]
+        with self._lock:
+            self._save()
+
+    def _fetch_range(
+        self: "SegmentedDownload",
+        segment: list[int],
+        progress: Callable[[int], None] | None,
+    ) -> None:
+        """Download one range, resuming after network errors."""
+        for attempt in range(self.retries + 1):
+            try:
+                self._stream_range(segment, progress)
+                break
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+            ):
+                if attempt == self.retries:
+                    raise
+                logging.warning(
+                    "Range %d-%d of %s interrupted, resuming.",
+                    segment[0],
+                    segment[1],
+                    self.url,
+                )
+
+    def _stream_range(
+        self: "SegmentedDownload",
+        segment: list[int],
+        progress: Callable[[int], None] | None,
+    ) -> None:
+        """Stream the rest of one range into its place in the file."""
+        start, end, done = segment
+        if start + done > end:
+            return
+
+        with self.session.get(
+            self.url,
+            params=self.params,
+            headers={"Range": f"bytes={start + done}-{end}"},
+            stream=True,
+            timeout=10,
+        ) as rsp:
+            rsp.raise_for_status()
+            if rsp.status_code != requests.codes.partial_content:
+                msg = f"Server stopped accepting ranges for {self.url}"
+                raise requests.exceptions.ConnectionError(msg)
+
+            # Unbuffered, so the sidecar never claims data still in a buffer
+            buffer = memoryview(bytearray(self.buffer_size))
+            with self.part_file.open("r+b", buffering=0) as f:
+                f.seek(start + done)
+                while size := read_into(rsp, buffer):
+                    size = min(size, end + 1 - start - segment[2])
+                    write_all(f, buffer[:size])
+                    self._advance(segment, size, progress)
+                    self._throttle(size)
+
+        if start + segment[2] <= end:
+            # Retried from where it stopped, as a file without an md5 can't
+            # be checked once assembled
+            msg = (
+                f"Range {start}-{end} of {self.url} ended at "
+                f"{start + segment[2]}"
+            )
+            raise requests.exceptions.ConnectionError(msg)
+
+    def _advance(
+        self: "SegmentedDownload",
+        segment: list[int],
+        size: int,
+        progress: Callable[[int], None] | None,
+    ) -> None:
+        """Record ``size`` more bytes of a range being written."""
+        with self._lock:
+            segment[2] += size
+            self.downloaded += size
+            self._unsaved += size
+            if self._unsaved >= self.save_interval:
+                self._save()
+        if progress is not None:
+            progress(self.downloaded)
+
+    def _save(self: "SegmentedDownload") -> None:
+        """Record the progress of each range (with the lock held)."""
+        self._unsaved = 0
+        with self.sidecar.open("w") as f:
+            yaml.safe_dump(
+                {
+                    "url": self.url,
+                    "size": self.size,
+                    "md5_hash": self.md5_hash,
+                    "segments": self._ranges,
+                },
+                f,
+            )
+
+
+class HashPipeline:
+    """
+    Ring of buffers, hashed on a thread of their own.
+
+    Take a free buffer with :meth:`take`, fill it, and pass it to :meth:`hash`.
+    Once hashed it is free to be taken again, so at most ``buffers`` are
+    waiting, and :meth:`take` blocks while they all are. hashlib releases
+    the GIL for large buffers, so hashing runs alongside receiving the next
+    buffer. Leaving the ``with`` block waits for every buffer to be hashed.
+
+    :param checksum: The hash to update.
+    :param buffer_size: The size of each buffer.
+    :param buffers: The number of buffers.
+    """
+
+    def __init__(
+        self: "HashPipeline",
+        checksum: "_Hash",
+        buffer_size: int,
+        buffers: int,
+    ) -> "HashPipeline":
+        """Create the object."""
+        self.checksum = checksum
+        self._free: SimpleQueue[memoryview] = SimpleQueue()
+        for _ in range(max(buffers, 1)):
+            self._free.put(memoryview(bytearray(buffer_size)))
+        self._filled: SimpleQueue[tuple[memoryview, int] | None] = SimpleQueue()
+        self._thread = Thread(target=self._run, name="hash", daemon=True)
+
+    def __enter__(self: "HashPipeline") -> Self:
+        """Start hashing."""
+        self._thread.start()
+        return self
+
+    def __exit__(self: "HashPipeline", *_: object) -> None:
+        """Wait for the buffers to be hashed."""
+        self._filled.put(None)
+        self._thread.join()
+
+    def take(self: "HashPipeline") -> memoryview:
+        """Take a free buffer, waiting for one to be hashed if needed."""
+        return self._free.get()
+
+    def give_back(self: "HashPipeline", buffer: memoryview) -> None:
+        """Return a buffer without hashing it."""
+        self._free.put(buffer)
+
+    def hash(self: "HashPipeline", buffer: memoryview, size: int) -> None:
+        """Hash the first ``size`` bytes of a buffer, then free it."""
+        self._filled.put((buffer, size))
+
+    def _run(self: "HashPipeline") -> None:
+        while (item := self._filled.get()) is not None:
+            buffer, size = item
+            self.checksum.update(buffer[:size])
+            self._free.put(buffer)
+
+
+def read_into(rsp: requests.Response, buffer: memoryview) -> int:
+    """
+    Fill a buffer from a streamed response.
+
+    Errors are raised as the same :mod:`requests` exceptions as
+    :meth:`~requests.Response.iter_content` raises.
+
+    :returns: The number of bytes read, which is only less than the size of
+        the buffer at the end of the response (0 once it has all been read).
+    """
+    rsp.raw.decode_content = True
+    try:
+        return rsp.raw.readinto(buffer)
+    except ProtocolError as e:
+        raise requests.exceptions.ChunkedEncodingError(e) from e
+    except DecodeError as e:
+        raise requests.exceptions.ContentDecodingError(e) from e
+    except ReadTimeoutError as e:
+        raise requests.exceptions.ConnectionError(e) from e
+    except SSLError as e:
+        raise requests.exceptions.SSLError(e) from e
+
+
+def write_all(f: BinaryIO, data: memoryview) -> None:
+    """Write all of ``data`` to an unbuffered file."""
+    while data:
+        data = data[f.write(data) :]
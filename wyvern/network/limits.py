@@ -0,0 +1,354 @@
+"""
+Host Limits.
+
+Limits the connections and request rate to each host, and backs off when a
+host asks us to slow down.
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from threading import BoundedSemaphore, Lock
+from urllib.parse import urlsplit
+
+from requests import PreparedRequest, Response, codes, exceptions
+from requests.adapters import HTTPAdapter
+
+THROTTLE_STATUSES = (codes.too_many_requests, codes.service_unavailable)
+"""Response codes meaning the host wants fewer requests."""
+
+
+class HostLimit:
+    """
+    Limits for the requests to one host.
+
+    The rate is enforced with a token bucket, so up to ``burst`` requests can
+    be made at once after a quiet spell, but no more than ``rate`` a second
+    are made over time.
+
+    When the host throttles us, every request to it waits for its
+    ``Retry-After`` (or an exponential backoff if it did not give one), and
+    the rate is halved. Each request which succeeds after that raises the rate
+    back towards ``rate`` by a twentieth, so we settle close to the highest
+    rate the host allows.
+
+    :param connections: The number of requests which can be made at once, or
+        None for no limit.
+    :param rate: The number of requests a second, or None for no limit.
+    :param burst: The number of requests which can be made at once before
+        being limited by the rate (defaults to one second's worth).
+    """
+
+    max_backoff: float = 60.0
+    """Longest time (in seconds) to back off without a ``Retry-After``."""
+
+    poll_interval: float = 0.05
+    """Seconds between checks for a free connection in :meth:`acquire_async`."""
+
+    def __init__(
+        self: "HostLimit",
+        connections: int | None = None,
+        rate: float | None = None,
+        burst: int | None = None,
+    ) -> "HostLimit":
+        """Create the object."""
+        self.connections = connections
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(int(rate or 1), 1)
+
+        self._slots = BoundedSemaphore(connections) if connections else None
+        self._lock = Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff = 0.0
+
+    def acquire(self: "HostLimit") -> None:
+        """Wait until a request can be made."""
+        if self._slots is not None:
+            self._slots.acquire()
+        while True:
+            with self._lock:
+                delay = self._take_token()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    async def acquire_async(self: "HostLimit") -> None:
+        """
+        Wait until a request can be made, without blocking the event loop.
+
+        The connections are shared with threads calling :meth:`acquire`, so
+        a free one is polled for rather than awaited.
+        """
+        if self._slots is not None:
+            while not self._slots.acquire(blocking=False):  # noqa: ASYNC110
+                await asyncio.sleep(self.poll_interval)
+        while True:
+            with self._lock:
+                delay = self._take_token()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def release(self: "HostLimit") -> None:
+        """Finish a request started with :meth:`acquire`."""
+        if self._slots is not None:
+            self._slots.release()
+
+    def throttled(self: "HostLimit", retry_after: float | None) -> None:
+        """
+        Back off after the host throttled a request.
+
+        :param retry_after: The seconds the host asked us to wait for, if any.
+        """
+        with self._lock:
+            if retry_after is None:
+                self._backoff = min(max(2 * self._backoff, 1), self.max_backoff)
+                retry_after = self._backoff
+            self._paused_until = max(
+                self._paused_until,
+                time.monotonic() + retry_after,
+            )
+            if self.rate is not None:
+                self.rate = max(self.rate / 2, self.max_rate / 20)
+
+    def succeeded(self: "HostLimit") -> None:
+        """Recover the rate after a request succeeded."""
+        with self._lock:
+            self._backoff = 0.0
+            if self.rate is not None:
+                self.rate = min(self.rate + self.max_rate / 20, self.max_rate)
+
+    def _take_token(self: "HostLimit") -> float:
+        """
+        Take a token from the bucket, if the host is not paused.
+
+        :returns: 0 if a token was taken, otherwise how long to wait.
+        """
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.rate is None:
+            return 0
+
+        elapsed = now - self._updated
+        self._tokens = min(self._tokens + elapsed * self.rate, self.burst)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+
+class HostLimits:
+    """
+    The :class:`HostLimit` of every host.
+
+    Built from a mapping of host name to the keyword arguments of
+    :class:`HostLimit` (eg from the ``HOST_LIMITS`` configuration key)::
+
+        api.itch.io:
+          connections: 4
+          rate: 10
+        "*":
+          connections: 8
+
+    The ``*`` entry is used for every host without an entry of its own. Hosts
+    with no limits still back off when throttled.
+
+    :param config: The limits for each host.
+    """
+
+    def __init__(
+        self: "HostLimits",
+        config: dict[str, dict] | None = None,
+    ) -> "HostLimits":
+        """Create the object."""
+        self.config = config or {}
+        self._limits: dict[str, HostLimit] = {}
+        self._lock = Lock()
+
+    def __getitem__(self: "HostLimits", host: str) -> HostLimit:
+        """Get the limit for a host."""
+        with self._lock:
+            if host not in self._limits:
+                config = self.config.get(host, self.config.get("*", {}))
+                self._limits[host] = HostLimit(**config)
+            return self._limits[host]
+
+
+class RequestStats:
+    """
+    Counts of the requests made through a :class:`LimitedAdapter`.
+
+    Requests made by an :class:`~wyvern.network.async_session.AsyncSession`
+    sharing the adapter are counted too.
+
+    Used to judge how the hosts are coping with the load we put on them.
+    """
+
+    def __init__(self: "RequestStats") -> "RequestStats":
+        """Create the object."""
+        self.requests = 0
+        """Requests made (including retries)."""
+
+        self.throttled = 0
+        """Requests throttled by the host."""
+
+        self.failed = 0
+        """Requests which timed out or could not connect."""
+
+        self.latency = 0.0
+        """Total seconds waited for response headers."""
+
+        self.downloads: dict[str, tuple[int, float]] = {}
+        """
+        Streamed requests (downloads) which got a response, and the total
+        seconds waited for their response headers, for each host.
+        """
+
+        self._lock = Lock()
+
+    def record(
+        self: "RequestStats",
+        latency: float,
+        *,
+        throttled: bool = False,
+        failed: bool = False,
+        download: str | None = None,
+    ) -> None:
+        """
+        Count a request.
+
+        :param download: The host, if the request was a download.
+        """
+        with self._lock:
+            self.requests += 1
+            self.throttled += throttled
+            self.failed += failed
+            self.latency += latency
+            if download is not None:
+                count, total = self.downloads.get(download, (0, 0.0))
+                self.downloads[download] = (count + 1, total + latency)
+
+    def snapshot(self: "RequestStats") -> tuple[int, int, int, float]:
+        """Get ``(requests, throttled, failed, latency)`` so far."""
+        with self._lock:
+            return self.requests, self.throttled, self.failed, self.latency
+
+    def download_latency(self: "RequestStats") -> dict[str, tuple[int, float]]:
+        """Get a copy of :attr:`downloads`."""
+        with self._lock:
+            return dict(self.downloads)
+
+
+class LimitedAdapter(HTTPAdapter):
+    """
+    HTTP adapter enforcing :class:`HostLimits`.
+
+    Each request holds one of its host's connections until its response is
+    closed (or read, if it is not streamed). Throttled requests are retried
+    up to ``throttle_retries`` times, once the host is ready for them. Every
+    request is counted in :attr:`stats`.
+
+    :param limits: The limits for each host.
+    :param throttle_retries: The number of times to retry a throttled request.
+    :param kwargs: Passed to :class:`~requests.adapters.HTTPAdapter`.
+    """
+
+    def __init__(
+        self: "LimitedAdapter",
+        limits: HostLimits,
+        throttle_retries: int = 5,
+        **kwargs: object,
+    ) -> "LimitedAdapter":
+        """Create the object."""
+        super().__init__(**kwargs)
+        self.limits = limits
+        self.throttle_retries = throttle_retries
+        self.stats = RequestStats()
+
+    def send(
+        self: "LimitedAdapter",
+        request: PreparedRequest,
+        **kwargs: object,
+    ) -> Response:
+        """Send a request once its host is ready for it."""
+        host = urlsplit(request.url).hostname or ""
+        limit = self.limits[host]
+        for attempt in range(self.throttle_retries + 1):
+            limit.acquire()
+            start = time.monotonic()
+            try:
+                rsp = super().send(request, **kwargs)
+            except (exceptions.ConnectionError, exceptions.Timeout):
+                self.stats.record(time.monotonic() - start, failed=True)
+                limit.release()
+                raise
+            except BaseException:
+                limit.release()
+                raise
+
+            throttled = rsp.status_code in THROTTLE_STATUSES
+            download = kwargs.get("stream") and not throttled
+            self.stats.record(
+                time.monotonic() - start,
+                throttled=throttled,
+                download=host if download else None,
+            )
+            if not throttled:
+                limit.succeeded()
+                break
+            limit.throttled(parse_retry_after(rsp.headers.get("Retry-After")))
+            if attempt < self.throttle_retries:
+                logging.info("%s throttled %s", request.url, rsp.status_code)
+                rsp.close()
+                limit.release()
+
+        if kwargs.get("stream"):
+            _release_on_close(rsp, limit)
+        else:
+            try:
+                rsp.content  # noqa: B018 - read the body inside the limit
+            finally:
+                limit.release()
+        return rsp
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parse a ``Retry-After`` header.
+
+    :returns: The number of seconds to wait, or None if it is missing or
+        invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((date - datetime.now(UTC)).total_seconds(), 0)
+
+
+def _release_on_close(rsp: Response, limit: HostLimit) -> None:
+    """Release the connection when the response is closed or collected."""
+    finalizer = weakref.finalize(rsp, limit.release)
+    ref = weakref.ref(rsp)  # Don't keep the response alive
+
+    def release_and_close() -> None:
+        rsp = ref()
+        if rsp is not None:
+            Response.close(rsp)
+        finalizer()
+
+    rsp.close = release_and_close
@@ -0,0 +1,75 @@
+"""
+HTTP Session.
+
+Creates the connection-pooled session shared by all jobs of a manager.
+"""
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .cache import CachingSession, HttpCache
+from .limits import THROTTLE_STATUSES, HostLimits, LimitedAdapter
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+"""Response codes which are retried by the session."""
+
+
+def make_session(
+    pool_connections: int = 10,
+    pool_maxsize: int = 10,
+    retries: int = 3,
+    limits: HostLimits | None = None,
+    cache: HttpCache | None = None,
+) -> Session:
+    """
+    Create a pooled HTTP session.
+
+    Connections are kept alive and reused between requests to the same host,
+    so paging through an API only pays for one handshake per connection.
+    Failed connections and :data:`RETRY_STATUSES` responses are retried with
+    an exponential backoff (honouring ``Retry-After``).
+
+    The connection pools are thread-safe, so one session can be shared between
+    all worker threads.
+
+    If ``limits`` are given, requests are held back to keep within them, and
+    throttled requests (429 and 503) are retried by the
+    :class:`~wyvern.network.limits.LimitedAdapter`, so every request to the
+    host backs off rather than only the one which was throttled.
+
+    If a ``cache`` is given, ``GET`` requests are revalidated against the
+    responses stored in it (see :class:`~wyvern.network.cache.CachingSession`).
+
+    :param pool_connections: The number of hosts to keep connections for.
+    :param pool_maxsize: The number of connections kept open for each host.
+        This should be at least the number of workers using the session.
+    :param retries: The number of times to retry a failed request.
+    :param limits: The limits for each host.
+    :param cache: Where to store responses.
+    """
+    statuses = RETRY_STATUSES
+    if limits is not None:
+        statuses = tuple(s for s in statuses if s not in THROTTLE_STATUSES)
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=statuses,
+        raise_on_status=False,
+        # Otherwise urllib3 retries throttled requests itself
+        respect_retry_after_header=limits is None,
+    )
+    kwargs = {
+        "pool_connections": pool_connections,
+        "pool_maxsize": pool_maxsize,
+        "max_retries": retry,
+    }
+    if limits is None:
+        adapter = HTTPAdapter(**kwargs)
+    else:
+        adapter = LimitedAdapter(limits, **kwargs)
+
+    session = Session() if cache is None else CachingSession(cache)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -4,21 +4,89 @@ Itch.io Downloader.
 Download your library from itch.io.
 """
 
+import json
 import logging
+import os
 import re
+from collections import defaultdict, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from contextlib import suppress
 from datetime import datetime
-from hashlib import md5
 from pathlib import Path
 from queue import Queue
+from threading import Lock
+from typing import ClassVar
+from weakref import WeakKeyDictionary
 
 import requests
 import yaml
 
-from wyvern.abstract import Artisan, Factory, Job, Manager
+from wyvern.abstract import Artisan, Factory, Job, Library, Manager
+from wyvern.data_store import SqliteDatabase
+from wyvern.network import Download, SegmentedDownload
+
+try:
+    import fcntl
+except ImportError:  # Reflinks are only supported on Linux
+    fcntl = None
 
 url_regex = re.compile(r"https://(.+)\.itch\.io/(.+)")
 
+FICLONE = 0x40049409
+"""Linux ioctl cloning a file's data into another (a reflink)."""
+
+_download_sessions: WeakKeyDictionary[Manager, str] = WeakKeyDictionary()
+_download_sessions_lock = Lock()
+
+
+def download_session(manager: Manager) -> str | None:
+    """
+    Get the download session of a manager's run, creating it the first time.
+
+    Every download in the run uses the same session, rather than one being
+    created for each game.
+
+    :returns: The session's UUID, or None if it could not be created.
+    """
+    with _download_sessions_lock:
+        if manager not in _download_sessions:
+            try:
+                rsp = manager.session.post(**_download_session_request(manager))
+            except requests.exceptions.Timeout:
+                logging.exception("Timeout when Loading URL")
+                return None
+            _download_sessions[manager] = rsp.json()["uuid"]
+        return _download_sessions[manager]
+
+
+async def download_session_async(manager: Manager) -> str:
+    """
+    Get the download session of a manager's run, without blocking.
+
+    The same as :func:`download_session`, but made with the manager's
+    ``async_session``.
+
+    :raises requests.exceptions.Timeout: If the request timed out.
+    """
+    uuid = _download_sessions.get(manager)
+    if uuid is None:
+        rsp = await manager.async_session.post(
+            **_download_session_request(manager),
+        )
+        with _download_sessions_lock:
+            uuid = _download_sessions.setdefault(manager, rsp.json()["uuid"])
+    return uuid
+
+
+def _download_session_request(manager: Manager) -> dict:
+    """Get the arguments of the request creating a download session."""
+    return {
+        "url": "https://api.itch.io/games/46774/download-sessions",
+        "headers": {"Authorization": manager.secrets["API_KEY"]},
+        "timeout": 10,
+    }
+
 
 class ItchioFactory(Factory):
     """Factory to load itch.io games."""
@@ -33,21 +101,73 @@ class ItchioFactory(Factory):
         Load Games.
 
         #. Get games from cache
-        #. Add Job to queue for each game in cache.
+        #. Get the uploads of ``METADATA_WORKERS`` (default 8) games at a
+           time, adding a job for each upload as each game's list arrives.
+
+        Games whose uploads could not be listed are added as
+        :class:`ItchioGameFactoryJob`, to be tried again by the manager.
         """
         job = GetGameCacheJob()
         job.do_download(manager)
 
-        for games in job.cache.values():
-            for data in games.values():
-                manager.add_job(ItchioGameFactoryJob(data))
+        workers = max(int(manager.configuration["METADATA_WORKERS"] or 8), 1)
+        uuid = download_session(manager)
+        pending: dict[Future, ItchioGameFactoryJob] = {}
+        with ThreadPoolExecutor(workers, thread_name_prefix="metadata") as ex:
+            for data in job.cache:
+                game = ItchioGameFactoryJob(data)
+                pending[ex.submit(game.get_uploads, manager)] = game
+                if len(pending) >= 2 * workers:
+                    self._add_games(manager, pending, uuid)
+            while pending:
+                self._add_games(manager, pending, uuid)
+
+    def _add_games(
+        self: "ItchioFactory",
+        manager: Manager,
+        pending: dict[Future, "ItchioGameFactoryJob"],
+        uuid: str | None,
+    ) -> None:
+        """Wait for games to be listed, and add the jobs for their uploads."""
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            game = pending.pop(future)
+            try:
+                uploads = future.result()
+            except (requests.exceptions.RequestException, ValueError, KeyError):
+                logging.exception("Failed to list uploads of %s", game.name)
+                uploads = None
+            if uploads is None or uuid is None:
+                manager.add_job(game)
+                continue
+            for upload in game.upload_jobs(manager, uploads, uuid):
+                manager.add_job(upload)
 
 
 class ItchioArtisan(Artisan):
-    """Download a singular game from itch.io."""
+    """
+    Download a singular game from itch.io.
+
+    The library cache is updated by the first request, and shared by the
+    later ones (which may be made from several threads at once).
+    """
 
     plugin_id = "itchio"
 
+    def __init__(self: "ItchioArtisan") -> None:
+        """Create Object."""
+        self._cache: GameCache | None = None
+        self._cache_lock = Lock()
+
+    def game_cache(self: "ItchioArtisan", manager: Manager) -> "GameCache":
+        """Get the library cache, updating it the first time."""
+        with self._cache_lock:
+            if self._cache is None:
+                job = GetGameCacheJob()
+                job.do_download(manager)
+                self._cache = job.cache
+            return self._cache
+
     def request_job(
         self: "ItchioArtisan",
         manager: Manager,
@@ -64,23 +184,26 @@ class ItchioArtisan(Artisan):
         #. Throw Error if it is neither
         #. return Job
         """
-        job = GetGameCacheJob()
-        job.do_download(manager)
+        match = url_regex.match(job_str)
+        if match is None:
+            logging.error("Not an itch.io game URL: %s", job_str)
+            return None
 
         # Check if game is in the cache
-        publisher, slug = url_regex.match(job_str).groups()
-        if publisher in job.cache and slug in job.cache[publisher]:
-            return ItchioGameFactoryJob(job.cache[publisher][slug])
+        publisher, slug = match.groups()
+        data = self.game_cache(manager).get(publisher, slug)
+        if data is not None:
+            return ItchioGameFactoryJob(data)
 
         # Now try and see if it is a free game
         try:
-            rsp = requests.get(
+            rsp = manager.session.get(
                 f"https://{publisher}.itch.io/{slug}/data.json",
                 timeout=10,
             )
             game_id = rsp.json()["id"]
 
-            rsp = requests.get(
+            rsp = manager.session.get(
                 f"https://api.itch.io/games/{game_id}",
                 headers={"Authorization": manager.secrets["API_KEY"]},
                 timeout=10,
@@ -102,74 +225,65 @@ class ItchioGameDownloadableJob(Job):
         self: "ItchioGameFactoryJob",
         upload: dict,
         game: "ItchioGameFactoryJob",
-        uuid: str,
+        uuid: str | None,
     ) -> None:
-        """Create Object."""
+        """
+        Create Object.
+
+        :param uuid: The run's download session, or None to get it when the
+            job is run.
+        """
         self.name = upload["filename"]
         self.data = upload
         self.out_dir = game.out_dir
         self.uuid = uuid
         self.game = game
+        self.total = upload.get("size") or 0
+        self.size_hint = upload.get("size")
+        self.group_hint = game.publisher
 
     def do_download(self: "ItchioGameFactoryJob", manager: Manager) -> None:
-        """Download a single file from itch.io."""
-        # Check if previous files exist
-
-        yaml_file = (
-            Path(manager.plugin_id)
-            / self.out_dir
-            / ".itch"
-            / str(self.data["id"])
-        ).with_suffix(".yaml")
+        """
+        Download a single file from itch.io.
 
-        if yaml_file.exists():
-            with yaml_file.open() as f:
-                data = yaml.safe_load(f)
+        :raises requests.exceptions.RequestException: If the download failed.
+        :raises wyvern.network.ChecksumError: If the file was corrupted.
+        """
+        # Check if previous files exist
+        yaml_file = self._sidecar(manager)
+        data = self._previous(manager)
 
+        if data is not None:
             old_dt = datetime.fromisoformat(data["updated_at"])
 
             # Move old file
             old_file = Path(manager.plugin_id) / self.out_dir / data["filename"]
 
-            if data["filename"].exists():
+            if old_file.exists():
                 renamed_file = (
                     old_file.parent
                     / ".old"
                     / (
                         old_file.stem
                         + old_dt.strftime("%Y-%m-%dT%H-%M-%S ")
-                        + "."
-                        + old_file.extension()
+                        + old_file.suffix
                     )
                 )
                 renamed_file.parent.mkdir(exist_ok=True, parents=True)
                 self.status = f"Moving old file to {renamed_file}"
-                self.updated.set()
                 old_file.rename(renamed_file)
 
-        # Download File
-        self.status = "Downloading File."
-        self.updated.set()
-        try:
-            rsp = requests.get(
-                f"https://api.itch.io/uploads/{self.data['id']}/download",
-                params=(
-                    {"uuid": self.uuid, "api_key": manager.secrets["API_KEY"]}
-                    | (
-                        {"download_key_id": self.game.id}
-                        if self.game.id
-                        else {}
-                    )
-                ),
-                stream=True,
-                timeout=10,
-            )
-        except requests.exceptions.Timeout:
-            logging.exception("Timeout when Loading URL")
+        if self._link_identical(manager):
+            self._record(manager, yaml_file)
             return
 
+        # Download File (resuming any partial download from a previous run)
+        self.status = "Downloading File."
+        download = self._make_download(manager, yaml_file.with_suffix(".part"))
+        part_file = download.fetch(self._update_progress)
+
         # Change filename if necessary
-        cd = rsp.headers.get("Content-Disposition")
+        cd = download.headers.get("Content-Disposition") or ""
         filename_re = re.search(r'filename="(.+)"', cd)
         if filename_re is not None:
             self.data["filename"], *_ = filename_re.groups(1)
@@ -177,35 +291,122 @@ class ItchioGameDownloadableJob(Job):
         new_file = (
             Path(manager.plugin_id) / self.out_dir / self.data["filename"]
         )
+        part_file.replace(new_file)
+        self._record(manager, yaml_file)
 
-        # md5 is insecure, but it's what itch uses
-        checksum = md5()  # noqa: S324
-        with new_file.open("wb") as f:
-            for chunk in rsp.iter_content(10240):
-                f.write(chunk)
-                self.progress = f.tell() / self.data["size"]
-                self.updated.set()
-                checksum.update(chunk)
-
-        # Check MD5
-        if (
-            "md5_hash" in self.data
-            and checksum.hexdigest() != self.data["md5_hash"]
-        ):
-            logging.error(
-                "Checksum failed for %s. Got: %s, expected %s",
-                new_file,
-                checksum.hexdigest(),
-                self.data["md5_hash"],
+    def _record(
+        self: "ItchioGameDownloadableJob",
+        manager: Manager,
+        yaml_file: Path,
+    ) -> None:
+        """Record the upload as downloaded."""
+        Manifest.for_manager(manager).record(
+            self.data["id"],
+            self.out_dir,
+            self.data,
+        )
+
+        # Write YAML File (unless disabled with NO_SIDECARS)
+        if not manager.configuration["NO_SIDECARS"]:
+            yaml_file.parent.mkdir(parents=True, exist_ok=True)
+            with yaml_file.open("w") as f:
+                yaml.safe_dump(self.data, f)
+
+    def _link_identical(
+        self: "ItchioGameDownloadableJob",
+        manager: Manager,
+    ) -> bool:
+        """
+        Link a file with the same content instead of downloading it.
+
+        Files in the :class:`Manifest` with the same ``md5_hash`` and
+        ``size`` (eg the same upload from another bundle) are reflinked, or
+        hard linked if the filesystem does not support reflinks. This is
+        disabled by the ``NO_DEDUPLICATE`` configuration.
+
+        The link is given the name the file was saved as, rather than the
+        upload's ``filename``, as downloads are named by their
+        ``Content-Disposition``.
+
+        :returns: If the file was linked.
+        """
+        md5_hash, size = self.data.get("md5_hash"), self.data.get("size")
+        if manager.configuration["NO_DEDUPLICATE"] or not md5_hash or not size:
+            return False
+
+        root = Path(manager.plugin_id)
+        for record in Manifest.for_manager(manager).find(md5_hash, size):
+            source = root / record["directory"] / record["filename"]
+            target = root / self.out_dir / record["filename"]
+            try:
+                if source.stat().st_size != size:
+                    continue
+            except FileNotFoundError:
+                continue
+            method = "already there" if source == target else None
+            method = method or _link_file(source, target)
+            if method is not None:
+                logging.info("Linked %s to %s (%s)", target, source, method)
+                self.data["filename"] = record["filename"]
+                self.done = size
+                return True
+        return False
+
+    def _make_download(
+        self: "ItchioGameDownloadableJob",
+        manager: Manager,
+        part_file: Path,
+    ) -> Download:
+        """
+        Create the downloader for the file.
+
+        Files of at least ``SEGMENT_THRESHOLD`` bytes (default 64MiB) are
+        downloaded as ``SEGMENTS`` (default 4) concurrent ranges. Responses
+        are read ``BUFFER_SIZE`` bytes (default 1MiB) at a time.
+
+        Jobs restored from a journal get the run's download session here.
+        """
+        if self.uuid is None:
+            self.uuid = download_session(manager)
+            if self.uuid is None:
+                msg = "Cannot create a download session"
+                raise requests.exceptions.RequestException(msg)
+
+        url = f"https://api.itch.io/uploads/{self.data['id']}/download"
+        params = {"uuid": self.uuid, "api_key": manager.secrets["API_KEY"]} | (
+            {"download_key_id": self.game.id} if self.game.id else {}
+        )
+        size = self.data.get("size")
+        md5_hash = self.data.get("md5_hash")
+
+        threshold = int(manager.configuration["SEGMENT_THRESHOLD"] or 64 << 20)
+        segments = int(manager.configuration["SEGMENTS"] or 4)
+        buffer_size = int(manager.configuration["BUFFER_SIZE"] or 0) or None
+        if size and size >= threshold and segments > 1:
+            return SegmentedDownload(
+                manager.session,
+                url,
+                part_file,
+                params=params,
+                size=size,
+                md5_hash=md5_hash,
+                bandwidth=manager.bandwidth,
+                buffer_size=buffer_size,
+                segments=segments,
             )
-            new_file.unlink()
-            # Set Error
-            return
+        return Download(
+            manager.session,
+            url,
+            part_file,
+            params=params,
+            size=size,
+            md5_hash=md5_hash,
+            bandwidth=manager.bandwidth,
+            buffer_size=buffer_size,
+        )
 
-        # Write YAML File
-        yaml_file.parent.mkdir(parents=True, exist_ok=True)
-        with yaml_file.open("w") as f:
-            yaml.safe_dump(self.data, f)
+    def _update_progress(self: "ItchioGameDownloadableJob", done: int) -> None:
+        self.done = done
 
     def should_skip(self: "ItchioGameFactoryJob", manager: Manager) -> bool:
         """
@@ -216,23 +417,77 @@ class ItchioGameDownloadableJob(Job):
         if self.data["storage"] != "hosted":
             logging.debug("Skipping because download is not a hosted file.")
             return True
-        file = (
+        data = self._previous(manager)
+        try:
+            old_dt = datetime.fromisoformat(data["updated_at"])
+            new_dt = datetime.fromisoformat(self.data["updated_at"])
+
+            return old_dt >= new_dt  # noqa: TRY300
+
+        except (TypeError, KeyError):
+            return False
+
+    def _sidecar(self: "ItchioGameDownloadableJob", manager: Manager) -> Path:
+        """Get the path of the YAML file describing the download."""
+        return (
             Path(manager.plugin_id)
             / self.out_dir
             / ".itch"
             / str(self.data["id"])
         ).with_suffix(".yaml")
+
+    def _previous(
+        self: "ItchioGameDownloadableJob",
+        manager: Manager,
+    ) -> dict | None:
+        """
+        Get what was recorded when the upload was last downloaded.
+
+        This is read from the :class:`Manifest`. Uploads downloaded before
+        the manifest existed are read from their YAML file, and added to the
+        manifest.
+        """
+        manifest = Manifest.for_manager(manager)
+        data = manifest.get(self.data["id"])
+        if data is not None:
+            return data
+
         try:
-            with file.open() as f:
+            with self._sidecar(manager).open() as f:
                 data = yaml.safe_load(f)
+        except (FileNotFoundError, yaml.YAMLError):
+            return None
+        if isinstance(data, dict) and "updated_at" in data:
+            manifest.record(self.data["id"], self.out_dir, data)
+            return data
+        return None
 
-            old_dt = datetime.fromisoformat(data["updated_at"])
-            new_dt = datetime.fromisoformat(self.data["updated_at"])
-
-            return old_dt >= new_dt  # noqa: TRY300
+    def serialize(self: "ItchioGameDownloadableJob") -> dict:
+        """
+        Store the upload, and only the parts of the game key it needs.
 
-        except (FileNotFoundError, KeyError, yaml.YAMLError):
-            return False
+        The download session is left out, as each run creates its own, and
+        the same upload has to be stored the same way in every run.
+        """
+        key = self.game.game_data
+        game = {k: key["game"][k] for k in ("id", "title", "url")}
+        return {
+            "upload": self.data,
+            "game": {k: key[k] for k in ("id", "game_id") if k in key}
+            | {"game": game},
+        }
+
+    @classmethod
+    def deserialize(
+        cls: type["ItchioGameDownloadableJob"],
+        data: dict,
+    ) -> "ItchioGameDownloadableJob":
+        """Recreate the job."""
+        return cls(
+            data["upload"],
+            ItchioGameFactoryJob(data["game"]),
+            None,
+        )
 
 
 class ItchioGameFactoryJob(Job):
@@ -252,6 +507,7 @@ class ItchioGameFactoryJob(Job):
             game["game"]["url"],
         ).groups()
         self.out_dir = f"{self.publisher}/{self.slug}/"
+        self.group_hint = self.publisher
 
         self.sub_jobs = Queue()
 
@@ -260,46 +516,87 @@ class ItchioGameFactoryJob(Job):
         Load in downloadable files for game.
 
         #. Get Uploads
-        #. Get UUID for downloading
+        #. Get UUID for downloading (shared by the run)
         #. Add downloadable files to queue
         #. Write YAML as cache
         """
-        self.status = "Querying game to get list of Downloadables"
+        uploads = self.get_uploads(manager)
+        if uploads is None:
+            return
+        uuid = download_session(manager)
+        if uuid is None:
+            return
+        for job in self.upload_jobs(manager, uploads, uuid):
+            self.sub_jobs.put(job)
 
+    def get_uploads(
+        self: "ItchioGameFactoryJob",
+        manager: Manager,
+    ) -> list[dict] | None:
+        """Get the game's uploads, or None if the request timed out."""
+        self.status = "Querying game to get list of Downloadables"
         try:
-            rsp = requests.get(
-                f"https://api.itch.io/games/{self.game_id}/uploads",
-                params={"download_key_id": self.id} if self.id else None,
-                headers={"Authorization": manager.secrets["API_KEY"]},
-                timeout=10,
-            )
+            rsp = manager.session.get(**self._uploads_request(manager))
         except requests.exceptions.Timeout:
             logging.exception("Timeout when Loading URL")
-            return
+            return None
+        return rsp.json()["uploads"]
 
-        uploads = rsp.json()["uploads"]
-        self.game_data["uploads"] = [u["id"] for u in uploads]
+    def _uploads_request(
+        self: "ItchioGameFactoryJob",
+        manager: Manager,
+    ) -> dict:
+        """Get the arguments of the request for the game's uploads."""
+        return {
+            "url": f"https://api.itch.io/games/{self.game_id}/uploads",
+            "params": {"download_key_id": self.id} if self.id else None,
+            "headers": {"Authorization": manager.secrets["API_KEY"]},
+            "timeout": 10,
+        }
+
+    async def do_download_async(
+        self: "ItchioGameFactoryJob",
+        manager: Manager,
+    ) -> None:
+        """
+        Load in downloadable files for game, without blocking.
+
+        The same as :meth:`do_download`, but made with the manager's
+        ``async_session`` if it has one.
+        """
+        session = getattr(manager, "async_session", None)
+        if session is None:
+            await super().do_download_async(manager)
+            return
 
+        self.status = "Querying game to get list of Downloadables"
         try:
-            rsp = requests.post(
-                "https://api.itch.io/games/46774/download-sessions",
-                headers={"Authorization": manager.secrets["API_KEY"]},
-                timeout=10,
-            )
+            rsp = await session.get(**self._uploads_request(manager))
+            uploads = rsp.json()["uploads"]
+            uuid = await download_session_async(manager)
         except requests.exceptions.Timeout:
             logging.exception("Timeout when Loading URL")
             return
 
-        uuid = rsp.json()["uuid"]
+        for job in self.upload_jobs(manager, uploads, uuid):
+            self.sub_jobs.put(job)
 
-        for u in uploads:
-            self.sub_jobs.put(ItchioGameDownloadableJob(u, self, uuid))
+    def upload_jobs(
+        self: "ItchioGameFactoryJob",
+        manager: Manager,
+        uploads: list[dict],
+        uuid: str,
+    ) -> list["ItchioGameDownloadableJob"]:
+        """Make a job for each upload, and write the YAML cache."""
+        self.game_data["uploads"] = [u["id"] for u in uploads]
 
         path = Path(manager.plugin_id) / self.out_dir / ".itch/index.yaml"
         path.parent.mkdir(exist_ok=True, parents=True)
         with path.open("w") as f:
             yaml.safe_dump(self.game_data, f)
 
+        return [ItchioGameDownloadableJob(u, self, uuid) for u in uploads]
+
     def should_skip(self: "ItchioGameFactoryJob", _: Manager) -> bool:
         """
         See if a job should be skipped.
@@ -313,6 +610,351 @@ class ItchioGameFactoryJob(Job):
         """
         return False
 
+    def serialize(self: "ItchioGameFactoryJob") -> dict:
+        """Store the game key."""
+        return {"game": self.game_data}
+
+    @classmethod
+    def deserialize(
+        cls: type["ItchioGameFactoryJob"],
+        data: dict,
+    ) -> "ItchioGameFactoryJob":
+        """Recreate the job."""
+        return cls(data["game"])
+
+
+class Manifest:
+    """
+    Index of the files downloaded by the itch.io plugin.
+
+    Each downloaded upload is recorded by its id, with the directory,
+    ``filename``, ``updated_at``, ``size`` and ``md5_hash`` it was downloaded
+    with. The ``filename`` is the name the file was saved as (from the
+    download's ``Content-Disposition``), which may differ from the upload's.
+    The records are stored in ``<plugin_id>/.itch/manifest.sqlite3``, and
+    loaded into memory once per run (see :meth:`for_manager`), so checking
+    whether an upload needs downloading does not touch the disk. Each update
+    is written in its own transaction.
+
+    The records are also indexed by their ``md5_hash`` and ``size``, so
+    files with the same content (eg the same upload in several bundles) can
+    be found with :meth:`find`.
+
+    :param path: The database file.
+    """
+
+    fields = ("directory", "filename", "updated_at", "size", "md5_hash")
+    """The values recorded for each upload."""
+
+    _open: ClassVar[dict[Path, "Manifest"]] = {}
+    _open_lock = Lock()
+
+    def __init__(self: "Manifest", path: Path) -> None:
+        """Open (or create) the manifest, loading every record."""
+        self._lock = Lock()
+        self._db = SqliteDatabase(
+            path,
+            [
+                (
+                    "CREATE TABLE IF NOT EXISTS uploads ("
+                    " id INTEGER PRIMARY KEY,"
+                    " directory TEXT,"
+                    " filename TEXT,"
+                    " updated_at TEXT,"
+                    " size INTEGER,"
+                    " md5_hash TEXT"
+                    ")"
+                ),
+            ],
+        )
+        self._records = {
+            upload_id: dict(zip(self.fields, row, strict=True))
+            for upload_id, *row in self._db.execute(
+                "SELECT id, directory, filename, updated_at, size, md5_hash"
+                " FROM uploads",
+            )
+        }
+        self._content: defaultdict[tuple, set[int]] = defaultdict(set)
+        for upload_id, record in self._records.items():
+            self._content[self._content_key(record)].add(upload_id)
+
+    @classmethod
+    def for_manager(cls: type["Manifest"], manager: Manager) -> "Manifest":
+        """Get the manifest for a manager's plugin, loading it only once."""
+        path = (Path(manager.plugin_id) / ".itch/manifest.sqlite3").resolve()
+        with cls._open_lock:
+            if path not in cls._open:
+                cls._open[path] = cls(path)
+            return cls._open[path]
+
+    def get(self: "Manifest", upload_id: int) -> dict | None:
+        """Get the record for an upload."""
+        return self._records.get(upload_id)
+
+    def find(self: "Manifest", md5_hash: str, size: int) -> list[dict]:
+        """Get the records of the uploads with the same content."""
+        with self._lock:
+            return [
+                self._records[upload_id]
+                for upload_id in self._content.get((md5_hash, size), ())
+            ]
+
+    def __iter__(self: "Manifest") -> Iterator[tuple[int, dict]]:
+        """Iterate over ``(upload_id, record)`` pairs."""
+        return iter(list(self._records.items()))
+
+    def record(
+        self: "Manifest",
+        upload_id: int,
+        directory: str,
+        upload: dict,
+    ) -> None:
+        """Record an upload being downloaded into ``directory``."""
+        record = {"directory": directory} | {
+            field: upload.get(field) for field in self.fields[1:]
+        }
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO uploads"
+                " (id, directory, filename, updated_at, size, md5_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (upload_id, *record.values()),
+            )
+            self._forget(upload_id)
+            self._records[upload_id] = record
+            self._content[self._content_key(record)].add(upload_id)
+
+    def forget(self: "Manifest", upload_id: int) -> None:
+        """Remove the record of an upload, so it is downloaded again."""
+        with self._lock:
+            self._db.execute("DELETE FROM uploads WHERE id = ?", (upload_id,))
+            self._forget(upload_id)
+
+    def _forget(self: "Manifest", upload_id: int) -> None:
+        """Remove an upload from memory (with the lock held)."""
+        record = self._records.pop(upload_id, None)
+        if record is not None:
+            self._content[self._content_key(record)].discard(upload_id)
+
+    @staticmethod
+    def _content_key(record: dict) -> tuple[str | None, int | None]:
+        return record["md5_hash"], record["size"]
+
+
+class ItchioLibrary(Library):
+    """The files downloaded by :class:`ItchioFactory`."""
+
+    plugin_id = "itchio"
+
+    def downloaded_files(
+        self: "ItchioLibrary",
+        manager: Manager,
+    ) -> Iterator[tuple[str, Path, int | None, str | None]]:
+        """
+        List the uploads recorded in the :class:`Manifest`.
+
+        Uploads only recorded in a YAML file (downloaded before the manifest
+        existed) are added to the manifest first.
+        """
+        manifest = Manifest.for_manager(manager)
+        root = Path(manager.plugin_id)
+        for sidecar in root.glob("*/*/.itch/*.yaml"):
+            if not sidecar.stem.isdigit() or manifest.get(int(sidecar.stem)):
+                continue
+            data = _load_yaml(sidecar)
+            if isinstance(data, dict) and "updated_at" in data:
+                directory = f"{sidecar.parent.parent.relative_to(root)}/"
+                manifest.record(int(sidecar.stem), directory, data)
+
+        for upload_id, record in manifest:
+            yield (
+                str(upload_id),
+                root / record["directory"] / record["filename"],
+                record["size"],
+                record["md5_hash"],
+            )
+
+    def redownload_jobs(
+        self: "ItchioLibrary",
+        manager: Manager,
+        file_ids: list[str],
+    ) -> Iterable[Job]:
+        """
+        Queue the games of the uploads again.
+
+        The uploads are removed from the :class:`Manifest` (and their YAML
+        files deleted) so they are downloaded again, while the game's other
+        uploads are still skipped. The game's key is read from its
+        ``index.yaml``, or from the ``CACHE_FILE`` by the upload's game id.
+        """
+        manifest = Manifest.for_manager(manager)
+        root = Path(manager.plugin_id)
+        cache = None
+        games = {}
+        for file_id in file_ids:
+            record = manifest.get(int(file_id))
+            if record is None:
+                continue
+            directory = root / record["directory"] / ".itch"
+            manifest.forget(int(file_id))
+            upload = _load_yaml(directory / f"{file_id}.yaml")
+            (directory / f"{file_id}.yaml").unlink(missing_ok=True)
+            if directory in games:
+                continue
+
+            key = _load_yaml(directory / "index.yaml")
+            if key is None and isinstance(upload, dict) and "game_id" in upload:
+                if cache is None and manager.configuration["CACHE_FILE"]:
+                    cache = GameCache(Path(manager.configuration["CACHE_FILE"]))
+                if cache is not None:
+                    key = cache.by_game_id(upload["game_id"])
+            if not isinstance(key, dict):
+                logging.error("Cannot find the game of upload %s", file_id)
+                continue
+            games[directory] = key
+
+        return [ItchioGameFactoryJob(key) for key in games.values()]
+
+
+def _link_file(source: Path, target: Path) -> str | None:
+    """
+    Make ``target`` a copy of ``source``, sharing its data on disk.
+
+    A reflink (a copy-on-write clone, on filesystems such as Btrfs and XFS)
+    is tried first, then a hard link. The target is replaced atomically.
+
+    :returns: ``"reflink"`` or ``"hard link"``, or None if neither could be
+        made (eg the files are on different filesystems).
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp = target.with_name(target.name + ".link")
+    temp.unlink(missing_ok=True)
+    if fcntl is not None:
+        try:
+            with source.open("rb") as src, temp.open("wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            temp.unlink(missing_ok=True)
+        else:
+            temp.replace(target)
+            return "reflink"
+    try:
+        os.link(source, temp)
+    except OSError:
+        return None
+    temp.replace(target)
+    return "hard link"
+
+
+def _load_yaml(path: Path) -> object:
+    """Load a YAML file, or None if it is missing or invalid."""
+    with suppress(FileNotFoundError, yaml.YAMLError), path.open() as f:
+        return yaml.safe_load(f)
+    return None
+
+
+class GameCache:
+    """
+    Indexed cache of the owned keys in an itch.io library.
+
+    The keys are stored in a SQLite database, indexed by ``publisher/slug``
+    and by ``game_id``, so single games can be looked up without loading the
+    whole library, and new keys are appended without rewriting it.
+
+    :param path: The database file, or None to keep the cache in memory. A
+        YAML cache from older versions (``.yaml`` or ``.yml``) is migrated to
+        a ``.sqlite3`` file of the same name.
+    """
+
+    def __init__(self: "GameCache", path: Path | None = None) -> None:
+        """Open (or create) the cache."""
+        yaml_path = None
+        if path is not None and path.suffix in {".yaml", ".yml"}:
+            yaml_path, path = path, path.with_suffix(".sqlite3")
+            if path.exists():
+                yaml_path = None
+
+        self._db = SqliteDatabase(
+            path,
+            [
+                (
+                    "CREATE TABLE IF NOT EXISTS keys ("
+                    " publisher TEXT NOT NULL,"
+                    " slug TEXT NOT NULL,"
+                    " game_id INTEGER,"
+                    " created_at TEXT,"
+                    " data TEXT NOT NULL,"
+                    " PRIMARY KEY (publisher, slug)"
+                    ")"
+                ),
+                "CREATE INDEX IF NOT EXISTS keys_game_id ON keys (game_id)",
+            ],
+        )
+
+        if yaml_path is not None:
+            self._migrate(yaml_path)
+
+    def get(self: "GameCache", publisher: str, slug: str) -> dict | None:
+        """Get the key for ``publisher/slug``."""
+        return self._one(
+            "SELECT data FROM keys WHERE publisher = ? AND slug = ?",
+            (publisher, slug),
+        )
+
+    def by_game_id(self: "GameCache", game_id: int) -> dict | None:
+        """Get the key for a game."""
+        return self._one(
+            "SELECT data FROM keys WHERE game_id = ? LIMIT 1",
+            (game_id,),
+        )
+
+    def add(self: "GameCache", keys: list[dict]) -> None:
+        """Append keys to the cache, in one transaction."""
+        rows = []
+        for key in keys:
+            publisher, slug = url_regex.match(key["game"]["url"]).groups()
+            rows.append(
+                (
+                    publisher,
+                    slug,
+                    key.get("game_id", key["game"].get("id")),
+                    key.get("created_at"),
+                    json.dumps(key, separators=(",", ":")),
+                ),
+            )
+        with self._db.transaction() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO keys"
+                " (publisher, slug, game_id, created_at, data)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def __iter__(self: "GameCache") -> Iterator[dict]:
+        """Iterate over the keys, in the order they were added."""
+        rows = self._db.execute("SELECT data FROM keys ORDER BY rowid")
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def __len__(self: "GameCache") -> int:
+        """Get the number of keys."""
+        [(count,)] = self._db.execute("SELECT COUNT(*) FROM keys")
+        return count
+
+    def _one(self: "GameCache", query: str, params: tuple) -> dict | None:
+        rows = self._db.execute(query, params)
+        return json.loads(rows[0][0]) if rows else None
+
+    def _migrate(self: "GameCache", yaml_path: Path) -> None:
+        """Import a YAML cache from older versions."""
+        data = None
+        with suppress(FileNotFoundError), yaml_path.open() as f:
+            data = yaml.safe_load(f)
+        if not data:
+            return
+        logging.info("Migrating itch.io cache from %s", yaml_path)
+        self.add([key for games in data.values() for key in games.values()])
+
 
 class GetGameCacheFactory(Factory):
     """Simple Factory to create a GetGameCache Job."""
@@ -333,12 +975,24 @@ class GetGameCacheJob(Job):
     def __init__(self: "GetGameCacheJob") -> None:
         """Create Object."""
         self.name = "Itch.io Game Cache"
-        self.cache = {}
+        self.cache = GameCache()
 
     def should_skip(self: "GetGameCacheJob", _: Manager) -> bool:
         """Will always Try to Download it."""
         return False
 
+    def serialize(self: "GetGameCacheJob") -> dict:
+        """Nothing needs to be stored."""
+        return {}
+
+    @classmethod
+    def deserialize(
+        cls: type["GetGameCacheJob"],
+        _: dict,
+    ) -> "GetGameCacheJob":
+        """Recreate the job."""
+        return cls()
+
     def do_download(self: "GetGameCacheJob", manager: Manager) -> None:
         """
         Update the library cache.
@@ -352,40 +1006,69 @@ class GetGameCacheJob(Job):
             #. For every key returned, see if it already exists in cache, adding
                it if it isn't. Exiting the loop if it is.
 
-        #. Write updated cache to file (if specified) or return otherwise.
-
         As the itch library is ordered in the order items were acquired, we can
         break out of the loop when we hit something already cached.
+
+        If the ``PAGE_WINDOW`` configuration is more than 1, that many pages
+        are requested at the same time. They are still added to the cache in
+        order, and pages after the one which ends the loop are cancelled (or
+        ignored if they have already been requested).
+
+        New keys are written to the cache (if ``CACHE_FILE`` is specified) as
+        each page is added.
         """
         # Load in existing cache
         if manager.configuration["CACHE_FILE"] != "":
-            path = Path(manager.configuration["CACHE_FILE"])
-            with suppress(FileNotFoundError), path.open() as f:
-                self.cache = yaml.safe_load(f)
-            if self.cache is None:
-                self.cache = {}
+            self.cache = GameCache(Path(manager.configuration["CACHE_FILE"]))
 
         # While there are pages to load
+        window = int(manager.configuration["PAGE_WINDOW"] or 1)
+        if window > 1:
+            self._iterate_pages(manager, window)
+        else:
+            i = 1
+            while self._iterate_page(manager, i):
+                i += 1
+
+    def _iterate_pages(
+        self: "GetGameCacheJob",
+        manager: Manager,
+        window: int,
+    ) -> None:
+        """Load several pages at a time, adding them to the cache in order."""
+        executor = ThreadPoolExecutor(max_workers=window)
+        pages: deque[Future] = deque()
         i = 1
-        while self._iterate_page(manager, i):
-            i += 1
-
-        # Write updated cache to file (if specified) or return otherwise.
-        if manager.configuration["CACHE_FILE"] is not None:
-            with path.open("w") as f:
-                yaml.safe_dump(self.cache, f)
+        try:
+            while True:
+                while len(pages) < window:
+                    pages.append(executor.submit(self._get_page, manager, i))
+                    i += 1
+                keys = pages.popleft().result()
+                if keys is None or not self._add_keys(keys):
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def _iterate_page(
         self: "GetGameCacheJob",
         manager: Manager,
         i: int,
     ) -> bool:
+        keys = self._get_page(manager, i)
+        return keys is not None and self._add_keys(keys)
+
+    def _get_page(
+        self: "GetGameCacheJob",
+        manager: Manager,
+        i: int,
+    ) -> list[dict] | None:
+        """Get the owned keys on page ``i``, or None if it timed out."""
         uri = "https://api.itch.io/profile/owned-keys"
         self.status = f"Downloading page {i}"
-        self.updated.set()
         logging.info("Downloading page %d", i)
         try:
-            rsp = requests.get(
+            rsp = manager.session.get(
                 uri,
                 timeout=10,
                 params={"page": i},
@@ -393,28 +1076,35 @@ class GetGameCacheJob(Job):
             )
         except requests.exceptions.Timeout:
             logging.exception("Timeout when Loading URL")
-            return False
+            return None
 
         j = rsp.json()
         # Validate keys are present
 
-        for key in j["owned_keys"]:
-            publisher, slug = url_regex.match(key["game"]["url"]).groups()
-            if publisher not in self.cache:
-                self.cache[publisher] = {}
-            if slug in self.cache[publisher]:
-                # As the itch library is ordered in the order items were
-                # acquired, we can break out of the loop when we hit
-                # something already cached. However, as it is possible to
-                # get the same game from multiple bundles, it is worth checking
-                # if the created_at dates (when it was added to the library)
-                # match.
-                if (
-                    key["created_at"]
-                    == self.cache[publisher][slug]["created_at"]
-                ):
-                    return False
-                continue
-            self.cache[publisher][slug] = key
+        return j["owned_keys"]
 
-        return len(j["owned_keys"]) != 0
+    def _add_keys(self: "GetGameCacheJob", keys: list[dict]) -> bool:
+        """Add a page of keys to the cache, returning if there may be more."""
+        new_keys = {}
+        try:
+            for key in keys:
+                publisher, slug = url_regex.match(key["game"]["url"]).groups()
+                cached = new_keys.get((publisher, slug)) or self.cache.get(
+                    publisher,
+                    slug,
+                )
+                if cached is not None:
+                    # As the itch library is ordered in the order items were
+                    # acquired, we can break out of the loop when we hit
+                    # something already cached. However, as it is possible to
+                    # get the same game from multiple bundles, it is worth
+                    # checking if the created_at dates (when it was added to
+                    # the library) match.
+                    if key["created_at"] == cached["created_at"]:
+                        return False
+                    continue
+                new_keys[(publisher, slug)] = key
+        finally:
+            self.cache.add(list(new_keys.values()))
+
+        return len(keys) != 0
@@ -28,7 +28,7 @@ class OperaVisionFactory(Factory):
         """Load the list of performances and populate the job queue."""
         # Get the list of performances
         try:
-            rsp = requests.get(
+            rsp = manager.session.get(
                 "https://operavision.eu/performances",
                 timeout=10,
             )
@@ -49,7 +49,9 @@ class OperaVisionFactory(Factory):
             company = company.replace(" / ", " ")  # Handle La Monaie De Munt
 
             config = self.generate_config(slug, company)
-            manager.add_job(YtdlpJob(url, f"{title} - {company}", **config))
+            video = YtdlpJob(url, f"{title} - {company}", **config)
+            video.group_hint = company
+            manager.add_job(video)
             manager.add_job(OperaVisionNFOJob(title, company, slug))
 
     def generate_config(
@@ -82,6 +84,8 @@ class OperaVisionFactory(Factory):
 class OperaVisionNFOJob(Job):
     """Job to create an NFO file from a performance page."""
 
+    resource = "cpu"
+
     def __init__(
         self: "OperaVisionNFOJob",
         name: str,
@@ -93,78 +97,106 @@ class OperaVisionNFOJob(Job):
         self.output_file = (
             Path(OperaVisionFactory.plugin_id) / company / slug
         ).with_suffix(".nfo")
+        self.company = company
         self.slug = slug
+        self.group_hint = company
 
-    def do_download(self: "OperaVisionNFOJob", _: Manager) -> None:
+    def do_download(self: "OperaVisionNFOJob", manager: Manager) -> None:
         """
         Do The Download.
 
-        Scrapes the content from the performance page.
+        Scrapes the content from the performance page, parsing it in
+        :meth:`~wyvern.abstract.Manager.run_cpu`.
         """
         uri = f"https://operavision.eu/performance/{self.slug}"
         try:
-            rsp = requests.get(
+            rsp = manager.session.get(
                 uri,
                 timeout=10,
             )
         except requests.exceptions.Timeout:
             logging.exception("Timeout when Loading URL")
-        soup = BeautifulSoup(rsp.text, "html.parser")
+        nfo = manager.run_cpu(make_nfo, rsp.text, uri, self.name)
 
-        doc = getDOMImplementation().createDocument(None, "video", None)
-        video = doc.documentElement
+        self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        with self.output_file.open("w") as f:
+            f.write(nfo)
 
-        e = doc.createElement("uniqueid")
-        e.attributes["type"] = "ovdl"
-        e.appendChild(doc.createTextNode(uri))
-        video.appendChild(e)
+    def should_skip(self: "OperaVisionNFOJob", _: Manager) -> bool:
+        """Determine if job can be skipped."""
+        return self.output_file.exists()
 
-        e = doc.createElement("title")
-        e.appendChild(doc.createTextNode(self.name))
-        video.appendChild(e)
+    def serialize(self: "OperaVisionNFOJob") -> dict:
+        """Store the constructor arguments."""
+        return {"name": self.name, "company": self.company, "slug": self.slug}
 
-        e = doc.createElement("outline")
-        e.appendChild(
-            doc.createTextNode(soup.select("p.intro")[0].text.strip()),
-        )
-        video.appendChild(e)
+    @classmethod
+    def deserialize(
+        cls: type["OperaVisionNFOJob"],
+        data: dict,
+    ) -> "OperaVisionNFOJob":
+        """Recreate the job."""
+        return cls(data["name"], data["company"], data["slug"])
 
-        e = doc.createElement("plot")
-        plot = soup.select(":has(> p.intro) p:not(.intro)")
-        plot = "\n\n".join([s.text.strip() for s in plot])
-        e.appendChild(doc.createTextNode(plot.strip()))
-        video.appendChild(e)
 
-        name_str = ""
-        role_str = ""
-        for actor in soup.select(".castTable .castRow"):
-            e = doc.createElement("actor")
-            children = [
-                "".join([c for c in i.text.strip() if c.isprintable()])
-                for i in actor.children
-            ]
-            if len(set(children)) == 1:
-                continue
-            if children[1] != "":
-                name_str = children[1]
-            if children[0] != "":
-                role_str = children[0]
-            name = doc.createElement("name")
-            name.appendChild(doc.createTextNode(name_str))
-            role = doc.createElement("role")
-            role.appendChild(doc.createTextNode(role_str))
-            e.appendChild(name)
-            e.appendChild(role)
-            video.appendChild(e)
+def make_nfo(html: str, uri: str, name: str) -> str:
+    """
+    Create an NFO file from a performance page.
 
-        self.output_file.parent.mkdir(parents=True, exist_ok=True)
-        with self.output_file.open("w") as f:
-            doc.writexml(
-                f,
-                addindent="    ",
-                newl="\n",
-            )
+    This is a module-level function, so it can be run in another process with
+    :meth:`~wyvern.abstract.Manager.run_cpu`.
 
-    def should_skip(self: "OperaVisionNFOJob", _: Manager) -> bool:
-        """Determine if job can be skipped."""
-        return self.output_file.exists()
+    :param html: The performance page.
+    :param uri: The URL of the performance page.
+    :param name: The title of the performance.
+    :returns: The contents of the NFO file.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+
+    doc = getDOMImplementation().createDocument(None, "video", None)
+    video = doc.documentElement
+
+    e = doc.createElement("uniqueid")
+    e.attributes["type"] = "ovdl"
+    e.appendChild(doc.createTextNode(uri))
+    video.appendChild(e)
+
+    e = doc.createElement("title")
+    e.appendChild(doc.createTextNode(name))
+    video.appendChild(e)
+
+    e = doc.createElement("outline")
+    e.appendChild(
+        doc.createTextNode(soup.select("p.intro")[0].text.strip()),
+    )
+    video.appendChild(e)
+
+    e = doc.createElement("plot")
+    plot = soup.select(":has(> p.intro) p:not(.intro)")
+    plot = "\n\n".join([s.text.strip() for s in plot])
+    e.appendChild(doc.createTextNode(plot.strip()))
+    video.appendChild(e)
+
+    name_str = ""
+    role_str = ""
+    for actor in soup.select(".castTable .castRow"):
+        e = doc.createElement("actor")
+        children = [
+            "".join([c for c in i.text.strip() if c.isprintable()])
+            for i in actor.children
+        ]
+        if len(set(children)) == 1:
+            continue
+        if children[1] != "":
+            name_str = children[1]
+        if children[0] != "":
+            role_str = children[0]
+        actor_name = doc.createElement("name")
+        actor_name.appendChild(doc.createTextNode(name_str))
+        role = doc.createElement("role")
+        role.appendChild(doc.createTextNode(role_str))
+        e.appendChild(actor_name)
+        e.appendChild(role)
+        video.appendChild(e)
+
+    return doc.toprettyxml(indent="    ", newl="\n")
@@ -6,11 +6,15 @@ Contains classes for downloading videos via yt-dlp.
 
 from contextlib import suppress
 from logging import Logger
+from typing import TYPE_CHECKING
 
 from yt_dlp import YoutubeDL
 
 from wyvern.abstract import Artisan, Job, Manager
 
+if TYPE_CHECKING:
+    from wyvern.network.bandwidth import Bandwidth
+
 
 class YtdlpJob(Job):
     """
@@ -22,6 +26,8 @@ class YtdlpJob(Job):
     :param kwargs: Additional parameters to add.
     """
 
+    resource = "subprocess"
+
     def __init__(
         self: "YtdlpJob",
         url: str,
@@ -40,6 +46,9 @@ class YtdlpJob(Job):
         self.logger = Logger(name="ytdlp")
         self.args["logger"] = self.logger
 
+        self._bandwidth: Bandwidth | None = None
+        self._received = 0
+
         if "progress_hooks" not in self.args:
             self.args["progress_hooks"] = []
         self.args["progress_hooks"].append(lambda x: self.progress_callback(x))
@@ -48,24 +57,61 @@ class YtdlpJob(Job):
         """Return True as yt-dlp will handle this checking for us."""
         return False
 
-    def do_download(self: "YtdlpJob", _: Manager) -> None:
-        """Run the download job."""
+    def serialize(self: "YtdlpJob") -> dict:
+        """
+        Store the URL, name and yt-dlp options.
+
+        The logger and progress hooks are recreated by the constructor.
+        """
+        return {
+            "url": self.url,
+            "name": self.name,
+            "args": {
+                k: v
+                for k, v in self.args.items()
+                if k not in ("logger", "progress_hooks")
+            },
+        }
+
+    @classmethod
+    def deserialize(cls: type["YtdlpJob"], data: dict) -> "YtdlpJob":
+        """Recreate the job."""
+        return cls(data["url"], data["name"], **data["args"])
+
+    def do_download(self: "YtdlpJob", manager: Manager) -> None:
+        """
+        Run the download job.
+
+        The bytes received are drawn from the manager's bandwidth by the
+        progress hook, which yt-dlp calls from its download loop.
+        """
         with YoutubeDL(self.args) as ydl:
-            ydl.download(self.url)
+            self._bandwidth = manager.bandwidth
+            self._received = 0
+            try:
+                ydl.download(self.url)
+            finally:
+                self._bandwidth = None
+
+    def _throttle(self: "YtdlpJob", downloaded: int) -> None:
+        """Wait for the bytes received since the last progress update."""
+        # Counts start again from 0 for each file
+        size = downloaded - self._received
+        if size < 0:
+            size = downloaded
+        self._received = downloaded
+        if self._bandwidth is not None and size > 0:
+            self._bandwidth.throttle(size)
 
     def progress_callback(self: "YtdlpJob", data: dict) -> None:
         """Update state from job progress."""
         with suppress(KeyError):
             self.name = data["info_dict"]["title"]
-        try:
-            tb = 0
-            if "total_bytes" in data:
-                tb = data["total_bytes"]
-            elif "total_bytes_estimate" in data:
-                tb = data["total_bytes_estimate"]
-            self.progress = data["downloaded_bytes"] / tb
-        except (KeyError, ZeroDivisionError, TypeError):
-            self.progress = 0
+        self.done = data.get("downloaded_bytes") or 0
+        self._throttle(self.done)
+        self.total = int(
+            data.get("total_bytes") or data.get("total_bytes_estimate") or 0,
+        )
 
         verb = data["status"].title()
         if data["info_dict"]["protocol"] != "https":
@@ -78,8 +124,6 @@ class YtdlpJob(Job):
             name = data["filename"]
         self.status = f"{verb} {thing}: {name}"
 
-        self.updated.set()
-
 
 class YtdlpArtisan(Artisan):
     """